@@ -0,0 +1,235 @@
+#
+# bench.py
+#
+# Copyright © 2020 Foundation Devices, Inc.
+# Licensed under the "BSD-2-Clause Plus Patent License"
+#
+# Encoder/decoder throughput and parts needed to complete, over a sweep of
+# message sizes, fragment lengths and frame loss/duplication rates.
+# Runs on CPython and the MicroPython unix port:
+#
+#   python bench.py [options]
+#   micropython bench.py [options]
+#
+#   --sizes 1024,16384       message sizes in bytes (10 MB: 10485760)
+#   --fragments 200,1000     max_fragment_len values
+#   --loss 0,0.25            rates of frames lost
+#   --dup 0,0.25             rates of frames seen twice
+#   --trials 5               decodes per configuration
+#   --elimination            decode with GF(2) elimination instead of peeling
+#   --no-memory              skip the (slow) peak memory run
+#   --seed Wolf              seed of the messages and of the frame losses
+#   --output FILE            JSON results, bench_output.txt by default
+#
+# Results of two commits can be compared by diffing their JSON outputs.
+
+import sys
+
+sys.path.append("src")
+
+import gc
+import json
+
+from ur.cbor_lite import CBOREncoder
+from ur.stats import ticks_us, ticks_diff
+from ur.ur import UR
+from ur.ur_decoder import URDecoder
+from ur.ur_encoder import UREncoder
+from ur.xoshiro256 import Xoshiro256
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+DEFAULTS = {
+    "sizes": "1024,16384,262144",
+    "fragments": "200,1000",
+    "loss": "0,0.25",
+    "dup": "0,0.25",
+    "trials": "5",
+    "seed": "Wolf",
+    "output": "bench_output.txt",
+}
+FLAGS = ("elimination", "no-memory")
+
+
+def parse_args(argv):
+    args = dict(DEFAULTS)
+    for flag in FLAGS:
+        args[flag] = False
+    i = 0
+    while i < len(argv):
+        name = argv[i]
+        if not name.startswith("--"):
+            raise ValueError("Unknown argument " + name)
+        name = name[2:]
+        if name in FLAGS:
+            args[name] = True
+        elif name in DEFAULTS and i + 1 < len(argv):
+            i += 1
+            args[name] = argv[i]
+        else:
+            raise ValueError("Unknown option --" + name)
+        i += 1
+    return args
+
+
+def make_message(size, rng):
+    # 8 random bytes per call: 10 MB messages stay quick to make
+    message = bytearray(size + 7)
+    for i in range(0, size, 8):
+        message[i : i + 8] = rng.next().to_bytes(8, "little")
+    return message[:size]
+
+
+def make_ur(message, trial):
+    # A trial number in front changes the checksum, and so every part
+    message[:4] = trial.to_bytes(4, "big")
+    encoder = CBOREncoder()
+    encoder.encodeBytes(message)
+    return UR("bytes", encoder.get_bytes())
+
+
+def run(ur, fragment_len, loss, dup, rng, elimination, memory=None):
+    """Decode `ur` from a frame stream with losses and duplicates, return
+    (frames, encode us, decode us, peak bytes or None)"""
+    encoder = UREncoder(ur, fragment_len)
+    decoder = URDecoder(elimination)
+    encode_us = 0
+    decode_us = 0
+    frames = 0
+    peak = None
+    if memory == "tracemalloc":
+        tracemalloc.start()
+    elif memory == "gc":
+        gc.collect()
+        base = gc.mem_alloc()
+        peak = 0
+
+    while not decoder.is_complete():
+        t = ticks_us()
+        part = encoder.next_part()
+        encode_us += ticks_diff(ticks_us(), t)
+        if rng.next_double() < loss:
+            continue
+        copies = 2 if rng.next_double() < dup else 1
+        for _ in range(copies):
+            t = ticks_us()
+            decoder.receive_part(part)
+            decode_us += ticks_diff(ticks_us(), t)
+            frames += 1
+        if memory == "gc":
+            peak = max(peak, gc.mem_alloc() - base)
+
+    if memory == "tracemalloc":
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if not decoder.is_success():
+        raise RuntimeError("Decoding failed")
+    return frames, encoder.fountain_encoder.seq_num, encode_us, decode_us, peak
+
+
+def distribution(values):
+    values = sorted(values)
+    n = len(values)
+    return {
+        "min": values[0],
+        "median": values[n // 2],
+        "p90": values[min(n - 1, (n * 9) // 10)],
+        "max": values[-1],
+        "mean": sum(values) / n,
+    }
+
+
+def memory_mode():
+    if tracemalloc is not None:
+        return "tracemalloc"
+    if hasattr(gc, "mem_alloc"):
+        return "gc"
+    return None
+
+
+def main(argv):
+    args = parse_args(argv)
+    trials = int(args["trials"])
+    memory = None if args["no-memory"] else memory_mode()
+    seed = args["seed"].encode()
+    results = []
+
+    for size in [int(v) for v in args["sizes"].split(",")]:
+        message = make_message(size, Xoshiro256.from_bytes(seed))
+        for fragment_len in [int(v) for v in args["fragments"].split(",")]:
+            for loss in [float(v) for v in args["loss"].split(",")]:
+                for dup in [float(v) for v in args["dup"].split(",")]:
+                    # The same frame losses for every commit compared
+                    rng = Xoshiro256.from_bytes(seed)
+                    frames = []
+                    parts = []
+                    encode_us = decode_us = 0
+                    for trial in range(trials):
+                        ur = make_ur(message, trial)
+                        run_frames, run_parts, enc, dec, _ = run(
+                            ur, fragment_len, loss, dup, rng, args["elimination"]
+                        )
+                        frames.append(run_frames)
+                        parts.append(run_parts)
+                        encode_us += enc
+                        decode_us += dec
+
+                    peak = None
+                    if memory is not None:
+                        peak = run(
+                            make_ur(message, 0),
+                            fragment_len,
+                            loss,
+                            dup,
+                            Xoshiro256.from_bytes(seed),
+                            args["elimination"],
+                            memory,
+                        )[4]
+
+                    seq_len = UREncoder(ur, fragment_len).fountain_encoder.seq_len()
+                    result = {
+                        "message_len": size,
+                        "max_fragment_len": fragment_len,
+                        "seq_len": seq_len,
+                        "loss": loss,
+                        "dup": dup,
+                        "encode_parts_per_s": sum(parts) * 1e6 / max(1, encode_us),
+                        "decode_frames_per_s": sum(frames) * 1e6 / max(1, decode_us),
+                        "parts_to_complete": distribution(parts),
+                        "frames_to_complete": distribution(frames),
+                        "peak_memory_bytes": peak,
+                    }
+                    results.append(result)
+                    print(
+                        "{} B / {} ({} fragments) loss {} dup {}: "
+                        "{:.0f} parts/s, {:.0f} frames/s, {:.2f}x parts, "
+                        "peak {}".format(
+                            size,
+                            fragment_len,
+                            seq_len,
+                            loss,
+                            dup,
+                            result["encode_parts_per_s"],
+                            result["decode_frames_per_s"],
+                            result["parts_to_complete"]["mean"] / seq_len,
+                            peak,
+                        )
+                    )
+
+    output = {
+        "implementation": sys.implementation.name,
+        "version": sys.version,
+        "memory": memory,
+        "args": args,
+        "results": results,
+    }
+    with open(args["output"], "w") as f:
+        json.dump(output, f)
+    print("Results written to " + args["output"])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,5 +1,8 @@
 BYTEWORDS = b"ABLEACIDALSOAPEXAQUAARCHATOMAUNTAWAYAXISBACKBALDBARNBELTBETABIASBLUEBODYBRAGBREWBULBBUZZCALMCASHCATSCHEFCITYCLAWCODECOLACOOKCOSTCRUXCURLCUSPCYANDARKDATADAYSDELIDICEDIETDOORDOWNDRAWDROPDRUMDULLDUTYEACHEASYECHOEDGEEPICEVENEXAMEXITEYESFACTFAIRFERNFIGSFILMFISHFIZZFLAPFLEWFLUXFOXYFREEFROGFUELFUNDGALAGAMEGEARGEMSGIFTGIRLGLOWGOODGRAYGRIMGURUGUSHGYROHALFHANGHARDHAWKHEATHELPHIGHHILLHOLYHOPEHORNHUTSICEDIDEAIDLEINCHINKYINTOIRISIRONITEMJADEJAZZJOINJOLTJOWLJUDOJUGSJUMPJUNKJURYKEEPKENOKEPTKEYSKICKKILNKINGKITEKIWIKNOBLAMBLAVALAZYLEAFLEGSLIARLIMPLIONLISTLOGOLOUDLOVELUAULUCKLUNGMAINMANYMATHMAZEMEMOMENUMEOWMILDMINTMISSMONKNAILNAVYNEEDNEWSNEXTNOONNOTENUMBOBEYOBOEOMITONYXOPENOVALOWLSPAIDPARTPECKPLAYPLUSPOEMPOOLPOSEPUFFPUMAPURRQUADQUIZRACERAMPREALREDORICHROADROCKROOFRUBYRUINRUNSRUSTSAFESAGASCARSETSSILKSKEWSLOTSOAPSOLOSONGSTUBSURFSWANTACOTASKTAXITENTTIEDTIMETINYTOILTOMBTOYSTRIPTUNATWINUGLYUNDOUNITURGEUSERVASTVERYVETOVIALVIBEVIEWVISAVOIDVOWSWALLWANDWARMWASPWAVEWAXYWEBSWHATWHENWHIZWOLFWORKYANKYAWNYELLYOGAYURTZAPSZEROZESTZINCZONEZOOM"
 
-# STYLE_STANDARD = 1
-# STYLE_URI = 2
-# STYLE_MINIMAL = 3
+STYLE_STANDARD = 1  # "able acid also", for human-readable backups
+STYLE_URI = 2  # "able-acid-also", for links
+STYLE_MINIMAL = 3  # "AEADAO", first and last letters, used by URs
+
+# Word separator of the 4-letter styles
+SEPARATORS = {STYLE_STANDARD: " ", STYLE_URI: "-"}
@@ -6,6 +6,8 @@
 from array import array
 from . import (
     BYTEWORDS,
+    SEPARATORS,
+    STYLE_MINIMAL,
 )
 from ..crc32 import crc32
 
@@ -16,6 +18,12 @@ CASE_MASK = ~0x20  # 0xDF = uppercase_mask. Was | 0x20 = lowercase mask
 class BytewordsDecoder:
     _WORD_ARRAY = None
     _DIM = 26
+    # Bulk minimal decoding: both letters of a minimal word read as one
+    # native uint16 -> byte value. Set to False when the port lacks
+    # memoryview.cast (MicroPython), then words are decoded one by one
+    _PAIR_VALUES = None
+    # Uppercase 4-letter word -> byte value
+    _WORD_VALUES = None
 
     @classmethod
     def _ensure_word_array(cls):
@@ -65,27 +73,93 @@ class BytewordsDecoder:
         return value
 
     @classmethod
-    def decode(cls, text):
+    def _ensure_pair_values(cls):
+        if cls._PAIR_VALUES is not None:
+            return
+
+        try:
+            words = bytearray(512)
+            for i in range(256):
+                offset = i << 2  # * 4
+                words[i << 1] = BYTEWORDS[offset]
+                words[(i << 1) + 1] = BYTEWORDS[offset + 3]
+            pairs = memoryview(words).cast("H")
+            cls._PAIR_VALUES = {pairs[i]: i for i in range(256)}
+        except AttributeError:
+            cls._PAIR_VALUES = False
+
+    @classmethod
+    def _decode_words(cls, text, separator):
+        """Return the decoded body and its 4 checksum bytes"""
+        if cls._WORD_VALUES is None:
+            cls._WORD_VALUES = {BYTEWORDS[i : i + 4]: i >> 2 for i in range(0, 1024, 4)}
+        values = cls._WORD_VALUES
+
+        words = text.upper().split(separator)
+        if len(words) < 5:
+            raise ValueError("Bytewords too short")
+
+        # Validating a word is a single dict lookup, no per-letter checks
+        try:
+            body = bytearray([values[w] for w in words[:-4]])
+            return body, bytes([values[w] for w in words[-4:]])
+        except KeyError as e:
+            raise ValueError("Unknown Bytewords word") from e
+
+    @classmethod
+    def _decode_minimal(cls, text):
+        """Return the decoded body and its 4 checksum bytes"""
+        if len(text) & 1:
+            raise ValueError("Invalid Bytewords length")
+        if len(text) < 10:
+            raise ValueError("Bytewords too short")
+
+        cls._ensure_pair_values()
+        pair_values = cls._PAIR_VALUES
+
+        if pair_values is False:
+            n = (len(text) >> 1) - 4
+            body = bytearray(n)
+            checksum = bytearray(4)
+            for i in range(n):
+                body[i] = cls._decode_word(text, i << 1, 2)
+            for i in range(4):
+                checksum[i] = cls._decode_word(text, (n + i) << 1, 2)
+            return body, checksum
+
+        # Case fold and look every word up in C, no Python call per word
+        pairs = memoryview(text.upper()).cast("H")
+        get = pair_values.__getitem__
+        try:
+            return bytearray(map(get, pairs[:-4])), bytes(map(get, pairs[-4:]))
+        except KeyError as e:
+            raise ValueError("Unknown Bytewords word") from e
+
+    @classmethod
+    def decode_prefix(cls, text, length):
+        """Decode up to the first `length` bytes of minimal Bytewords, e.g. a
+        CBOR header. The checksum needs the whole text, so it isn't checked"""
+        if isinstance(text, str):
+            text = text.encode()
+        body, _ = cls._decode_minimal(text[: (length + 4) << 1])
+        return body
+
+    @classmethod
+    def decode(cls, text, style=STYLE_MINIMAL):
         """
         Decode Bytewords string according to selected style
         """
         if isinstance(text, str):
             text = text.encode()
-        word_len = 4
-        buf = bytearray()
-        word_len = 2
-        for i in range(0, len(text), word_len):
-            buf.append(cls._decode_word(text, i, word_len))
-
-        if len(buf) < 5:
-            raise ValueError("Bytewords too short")
+        if style == STYLE_MINIMAL:
+            body, checksum = cls._decode_minimal(text)
+        elif style in SEPARATORS:
+            body, checksum = cls._decode_words(text, SEPARATORS[style].encode())
+        else:
+            raise ValueError("Unknown Bytewords style")
 
         # Checksum validation
-        body = buf[:-4]
-        checksum_bytes = buf[-4:]
-        computed = crc32(body).to_bytes(4, "big")
-
-        if computed != checksum_bytes:
+        if crc32(body).to_bytes(4, "big") != checksum:
             raise ValueError("Bytewords checksum mismatch")
 
         return body
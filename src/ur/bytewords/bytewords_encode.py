@@ -5,39 +5,73 @@
 
 from . import (
     BYTEWORDS,
+    SEPARATORS,
+    STYLE_MINIMAL,
 )
-from ..crc32 import crc32
+from ..crc32 import CRC32
 
 
 class BytewordsEncoder:
+    _MINIMAL_WORDS = None
+    _WORDS = None
+
     @classmethod
-    def _encode_minimal(cls, buf):
-        """Concatenate 2-character minimal words without separator"""
-        out = bytearray(len(buf) << 1)  # * 2
-        pos = 0
+    def _ensure_minimal_words(cls):
+        """Lazily build the table of the 256 2-character minimal words
+        (first and last letters of each Byteword)"""
+
+        if cls._MINIMAL_WORDS is not None:
+            return
+
+        words = []
+        for i in range(256):
+            offset = i << 2  # * 4
+            words.append(chr(BYTEWORDS[offset]) + chr(BYTEWORDS[offset + 3]))
+
+        cls._MINIMAL_WORDS = tuple(words)
 
-        for byte in buf:
-            offset = byte << 2  # * 4
-            out[pos] = BYTEWORDS[offset]
-            out[pos + 1] = BYTEWORDS[offset + 3]
-            pos += 2
+    @classmethod
+    def _ensure_words(cls):
+        """Lazily build the table of the 256 lowercase 4-letter Bytewords"""
+
+        if cls._WORDS is not None:
+            return
 
-        return out.decode()
+        words = BYTEWORDS.decode().lower()
+        cls._WORDS = tuple(words[i : i + 4] for i in range(0, 1024, 4))
 
     @classmethod
-    def _add_checksum(cls, data):
-        """Append 4-byte CRC32 checksum"""
-        out = bytearray(data)
-        out.extend(crc32(out).to_bytes(4, "big"))
-        return out
+    def _encode_words(cls, buf, separator, checksum=b""):
+        """Join 4-letter words with the style separator"""
+        cls._ensure_words()
+        words = cls._WORDS
+        out = [words[byte] for byte in buf]
+        out.extend([words[byte] for byte in checksum])
+        return separator.join(out)
+
+    @classmethod
+    def _encode_minimal(cls, buf, checksum=b""):
+        """Concatenate 2-character minimal words without separator"""
+        cls._ensure_minimal_words()
+        words = cls._MINIMAL_WORDS
+        out = [words[byte] for byte in buf]
+        out.extend([words[byte] for byte in checksum])
+        return "".join(out)
 
     @classmethod
-    def encode(cls, data):
+    def encode(cls, data, style=STYLE_MINIMAL):
         """
         Encode bytes into Bytewords string using the specified style
         """
 
-        # Add checksum to data
-        payload_with_crc = cls._add_checksum(data)
+        # The 4-byte CRC32 checksum is encoded after the data, without
+        # copying the data to append it
+        crc = CRC32()
+        crc.update(data)
+        checksum = crc.digest()
 
-        return cls._encode_minimal(payload_with_crc)
+        if style == STYLE_MINIMAL:
+            return cls._encode_minimal(data, checksum)
+        if style not in SEPARATORS:
+            raise ValueError("Unknown Bytewords style")
+        return cls._encode_words(data, SEPARATORS[style], checksum)
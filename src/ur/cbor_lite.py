@@ -159,7 +159,7 @@ class CBORDecoder:
         pos = self.pos
         buf = self.buf
         if pos >= len(buf):
-            raise Exception("Not enough input")
+            raise ValueError("Not enough input")
         octet = buf[pos]
         self.pos = pos + 1
         return octet & Tag_Major_mask, octet & Tag_Minor_mask, 1
@@ -167,7 +167,7 @@ class CBORDecoder:
     def _decode_with_tag(self, expected_tag, flags):
         tag, value, length = self.decodeTagAndValue(flags)
         if tag != expected_tag:
-            raise ValueError("Expected " + expected_tag)
+            raise ValueError("Expected tag {}".format(expected_tag))
         return value, length
 
     def decodeTagAndValue(self, flags):
@@ -185,36 +185,36 @@ class CBORDecoder:
 
         if additional == Tag_Minor_length8:
             if end - pos < 8:
-                raise Exception("Not enough input")
+                raise ValueError("Not enough input")
             for shift in _SHIFTS_8:
                 value |= buf[self.pos] << shift
                 self.pos += 1
 
         elif additional == Tag_Minor_length4:
             if end - pos < 4:
-                raise Exception("Not enough input")
+                raise ValueError("Not enough input")
             for shift in _SHIFTS_4:
                 value |= buf[self.pos] << shift
                 self.pos += 1
 
         elif additional == Tag_Minor_length2:
             if end - pos < 2:
-                raise Exception("Not enough input")
+                raise ValueError("Not enough input")
             for shift in _SHIFTS_2:
                 value |= buf[self.pos] << shift
                 self.pos += 1
 
         elif additional == Tag_Minor_length1:
             if end - pos < 1:
-                raise Exception("Not enough input")
+                raise ValueError("Not enough input")
             value = buf[self.pos]
             self.pos += 1
 
         else:
-            raise Exception("Bad additional value")
+            raise ValueError("Bad additional value")
 
         if (flags & Flag_Require_Minimal_Encoding) and value == 0:
-            raise Exception("Encoding not minimal")
+            raise ValueError("Encoding not minimal")
 
         return tag, value, self.pos - start + 1
 
@@ -225,11 +225,11 @@ class CBORDecoder:
         # First value is the length of the bytes that follow
         tag, byte_length, size_length = self.decodeTagAndValue(flags)
         if tag != Tag_Major_byteString:
-            raise Exception("Not a byteString")
+            raise ValueError("Not a byteString")
 
         end = len(self.buf)
         if end - self.pos < byte_length:
-            raise Exception("Not enough input")
+            raise ValueError("Not enough input")
 
         mv = memoryview(self.buf)[self.pos : self.pos + byte_length]
         self.pos += byte_length
@@ -10,3 +10,21 @@ from .constants import MAX_UINT32
 
 def crc32(buf):
     return binascii.crc32(buf) & MAX_UINT32
+
+
+class CRC32:
+    """Running CRC32 of data fed in pieces, straight from the caller's
+    buffers (no need to join them first)"""
+
+    def __init__(self):
+        self.crc = 0
+
+    def update(self, buf):
+        self.crc = binascii.crc32(buf, self.crc)
+
+    def value(self):
+        return self.crc & MAX_UINT32
+
+    # 4 bytes, big endian, as appended by Bytewords
+    def digest(self):
+        return self.value().to_bytes(4, "big")
@@ -5,12 +5,9 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
-from .fountain_utils import (
-    choose_fragments,
-    reset_degree_cache,
-)
-from .utils import join_bytes, xor_into, take_first
-from .crc32 import crc32
+from .fountain_utils import choose_fragments, get_degree_sampler
+from .utils import join_bytes, xor_into, take_first, bit_index
+from .crc32 import CRC32
 from .basic_decoder import BasicDecoder
 
 
@@ -18,69 +15,181 @@ class InvalidChecksum(Exception):
     pass
 
 
+# Buffer ownership: receive_part() copies the data of every new part once,
+# into a buffer taken from the decoder's pool, and never writes to or keeps
+# the caller's buffer (which may be a view into a Bytewords/CBOR decode).
+# From then on the decoder owns that buffer: reductions XOR into it in place
+# and parts found redundant give it back to the pool for the next frame.
+#
+# Resolved fragments go straight to their slot of the message. By default
+# that's a bytearray, but an `output` buffer (e.g. a writable mmap) or a
+# binary file can be given instead, so that only the mixed parts are kept in
+# RAM; with a file, fragments are read back from it when a new part needs
+# them.
+#
+# `max_mixed_parts` and `max_mixed_bytes` bound the parts held that aren't
+# resolved yet (mixed parts, or unsolved rows with elimination): when full,
+# one is evicted by `eviction_policy`, at the cost of a few more frames.
+# Each of them then tracks the seq_nums of the parts XORed into it (modulo
+# resolved fragments), and those are forgotten on eviction so that the
+# frames get received again when a display loops over them.
 class FountainDecoder(BasicDecoder):
+    # Spare fragment buffers kept for reuse
+    MAX_FREE_BUFFERS = 4
+
+    # Eviction policies
+    EVICT_HIGHEST_DEGREE = "degree"  # the furthest from resolving, oldest first
+    EVICT_OLDEST = "oldest"
+
     class Part:
-        __slots__ = ("indexes", "data", "_index")
+        __slots__ = ("indexes", "mask", "data", "_index", "serial", "seq_nums")
 
-        def __init__(self, indexes, data):
+        def __init__(self, indexes, data, mask=None):
             self.indexes = frozenset(indexes)
+            if mask is None:
+                mask = 0
+                for i in self.indexes:
+                    mask |= 1 << i
+            # The same index set as an int bitmask, for cheap subset tests
+            self.mask = mask
             self.data = data
             # cache its index once if simple part
             self._index = next(iter(self.indexes)) if len(self.indexes) == 1 else None
+            # Arrival order, for the eviction policy
+            self.serial = 0
+            # Parts XORed into this one, only tracked under a budget
+            self.seq_nums = None
 
         def is_simple(self):
             return self._index is not None
 
+        def reduce_by(self, b, data=None):
+            """In place version of reduced_part_by_part() for a part the
+            decoder holds, `b` must be a strict subset of it"""
+            self.indexes = self.indexes.difference(b.indexes)
+            self.mask ^= b.mask
+            xor_into(self.data, b.data if data is None else data)
+            if self.seq_nums is not None and b.seq_nums is not None:
+                self.seq_nums = self.seq_nums ^ b.seq_nums
+            if len(self.indexes) == 1:
+                self._index = next(iter(self.indexes))
+
         def index(self):
             return self._index
 
         @classmethod
-        def from_encoder_part(cls, p):
-            return cls(choose_fragments(p.seq_num, p.seq_len, p.checksum), p.data[:])
+        def from_encoder_part(cls, p, sampler=None, data=None):
+            if data is None:
+                data = p.data[:]
+            return cls(
+                choose_fragments(p.seq_num, p.seq_len, p.checksum, sampler), data
+            )
 
     # FountainDecoder
-    def __init__(self):
+    # use_elimination solves the parts as a GF(2) linear system instead of
+    # only peeling them, which completes with fewer parts on average
+    def __init__(
+        self,
+        use_elimination=False,
+        output=None,
+        max_mixed_parts=None,
+        stats=None,
+        max_mixed_bytes=None,
+        eviction_policy=EVICT_HIGHEST_DEGREE,
+        compaction_threshold=8,
+    ):
         super().__init__()
+        self.stats = stats
+        self.use_elimination = use_elimination
+        self.output = output
+        self.max_mixed_parts = max_mixed_parts
+        self.max_mixed_bytes = max_mixed_bytes
+        self.eviction_policy = eviction_policy
+        # Processed parts after which an emptied queue is cleared, lower
+        # saves RAM (Ideally, it would be 16)
+        self.compaction_threshold = compaction_threshold
+        self.evicted_parts_count = 0
+        self.track_seq_nums = max_mixed_parts is not None or max_mixed_bytes is not None
+        # Called with the seq_num of every part forgotten on eviction
+        self.on_forget = None
+        # Elimination rows in reduced row echelon form:
+        # pivot bit -> [index bitmask, data, serial, seq_nums]
+        self.rows = {}
         self.received_part_indexes = set()
         # self.last_part_indexes = None
         self.processed_parts_count = 0
+        # A part is fully determined by its seq_num once the checksum is
+        # validated, so repeated frames are dropped before choose_fragments
+        self.received_seq_nums = set()
+        self.duplicate_parts_count = 0
         self.expected_part_indexes = None
         self.expected_fragment_len = None
         self.expected_message_len = None
         self.expected_checksum = None
-        self.simple_parts = {}
-        self.mixed_parts = {}
+        # Resolved fragments are written straight into their slot of the
+        # message, and the CRC is run over the leading contiguous fragments
+        # as soon as they are in
+        self.message = None
+        self.fragment_buffer = None
+        self.crc = CRC32()
+        self.crc_len = 0
+        self.sampler = None
+        self.simple_parts = {}  # fragment index -> part
+        self.mixed_parts = {}  # index bitmask -> part
+        # fragment index -> mixed parts containing it
+        self.fragment_parts = {}
         self.queued_parts = []
         self.queue_index = 0
+        self.free_buffers = []
 
     def _clear_caches(self):
+        self.rows.clear()
         self.simple_parts.clear()
         self.mixed_parts.clear()
+        self.fragment_parts.clear()
         self.queued_parts.clear()
+        self.queue_index = 0
+        self.free_buffers.clear()
         self.received_part_indexes.clear()
+        self.received_seq_nums.clear()
         self.expected_part_indexes = None
+        self.message = None
+        self.fragment_buffer = None
 
     def is_complete(self):
-        if self.result is not None:
-            # Decode / Encoder operations don't usually happen in parallel, otherwise reset_degree_cache() will need to be removed from here
-            reset_degree_cache()  # reset the cache for receive_part -> FountainDecoder.Part.from_encoder_part -> choose_fragments -> choose_degree
-            return True
-        return False
+        return self.result is not None
 
     def expected_part_count(self):
         if self.expected_part_indexes is not None:
             return len(self.expected_part_indexes)
         raise RuntimeError("Decoder not initialized yet")
 
+    def buffered_bytes(self):
+        """Rough RAM held for the message and the fragments in progress"""
+        if self.expected_part_indexes is None:
+            return 0
+        count = len(self.mixed_parts) + len(self.free_buffers)
+        count += len(self.queued_parts) - self.queue_index
+        if self.use_elimination:
+            count += len(self.rows) - len(self.received_part_indexes)
+        total = count * self.expected_fragment_len
+        if self.output is None:
+            total += self.expected_message_len
+        return total
+
     def estimated_percent_complete(self):
         if self.is_complete():
             return 1
         if self.expected_part_indexes is None:
             return 0
+        if self.use_elimination:
+            return min(0.99, len(self.rows) / self.expected_part_count())
         estimated_input_parts = self.expected_part_count() * 1.75
         return min(0.99, self.processed_parts_count / estimated_input_parts)
 
-    def receive_part(self, encoder_part):
+    # process=False only queues the part, for process_queue() to peel many
+    # of them in one pass
+    def receive_part(self, encoder_part, process=True):
         # Don't process the part if we're already done
         if self.is_complete():
             return False
@@ -89,14 +198,37 @@ class FountainDecoder(BasicDecoder):
         if not self.validate_part(encoder_part):
             return False
 
+        # Don't process the same frame twice
+        if encoder_part.seq_num in self.received_seq_nums:
+            self.duplicate_parts_count += 1
+            if self.stats is not None:
+                self.stats.count("duplicates")
+            return True
+        self.received_seq_nums.add(encoder_part.seq_num)
+
         # Add this part to the queue
-        p = FountainDecoder.Part.from_encoder_part(encoder_part)
+        p = FountainDecoder.Part.from_encoder_part(
+            encoder_part, self.sampler, self.acquire_buffer(encoder_part.data)
+        )
         # self.last_part_indexes = p.indexes
-        self.queued_parts.append(p)
-
-        # Process the queue until we're done or the queue is empty
-        while not self.is_complete() and self.queue_index < len(self.queued_parts):
-            self.process_queue_item()
+        p.serial = self.processed_parts_count
+        if self.track_seq_nums:
+            p.seq_nums = frozenset((encoder_part.seq_num,))
+
+        if self.use_elimination:
+            if self.stats is not None:
+                t = self.stats.start()
+                self.eliminate_part(p)
+                self.stats.stop("eliminate", t)
+            else:
+                self.eliminate_part(p)
+        else:
+            self.queued_parts.append(p)
+            limit = self._mixed_parts_limit()
+            if process or (
+                limit is not None and len(self.queued_parts) - self.queue_index > limit
+            ):
+                self.process_queue()
 
         # Keep track of how many parts we've processed
         self.processed_parts_count += 1
@@ -105,95 +237,290 @@ class FountainDecoder(BasicDecoder):
 
         return True
 
+    def acquire_buffer(self, data):
+        """Copy the data of a new part into a buffer owned by the decoder"""
+        if self.free_buffers:
+            buf = self.free_buffers.pop()
+            buf[:] = data
+            return buf
+        return bytearray(data)
+
+    def release_buffer(self, buf):
+        if len(self.free_buffers) < self.MAX_FREE_BUFFERS:
+            self.free_buffers.append(buf)
+
     # Join all the fragments of a message together, throwing away any padding
     @staticmethod
     def join_fragments(fragments, message_len):
         message = join_bytes(fragments)
         return take_first(message, message_len)
 
+    def process_queue(self):
+        queue = self.queued_parts
+        # Several parts waiting: the lowest degrees first, so that the simple
+        # parts are in before the mixed ones are reduced and stored
+        if len(queue) - self.queue_index > 1:
+            rest = queue[self.queue_index :]
+            rest.sort(key=lambda part: len(part.indexes))
+            queue[self.queue_index :] = rest
+
+        # Process the queue until we're done or the queue is empty
+        while not self.is_complete() and self.queue_index < len(queue):
+            self.process_queue_item()
+
     def process_queue_item(self):
         part = self.queued_parts[self.queue_index]
         self.queue_index += 1
 
+        stats = self.stats
+        if stats is not None:
+            stats.peak("queue_length", len(self.queued_parts) - self.queue_index + 1)
+            t = stats.start()
+
         if part.is_simple():
             self.process_simple_part(part)
+            if stats is not None:
+                stats.stop("peel_simple", t)
         else:
             self.process_mixed_part(part)
-
-            # Aggressive queue compaction for RAM (Ideally, it would be 16)
-            if self.queue_index > 8 and self.queue_index == len(self.queued_parts):
-                self.queued_parts.clear()
-                self.queue_index = 0
+            if stats is not None:
+                stats.stop("peel_mixed", t)
+                stats.peak("mixed_parts", len(self.mixed_parts))
+
+        # Aggressive queue compaction for RAM
+        if self.queue_index > self.compaction_threshold and self.queue_index == len(
+            self.queued_parts
+        ):
+            self.queued_parts.clear()
+            self.queue_index = 0
+
+    def add_mixed_part(self, p):
+        if p.mask in self.mixed_parts:
+            self.release_buffer(p.data)
+            return
+        limit = self._mixed_parts_limit()
+        if limit is not None and len(self.mixed_parts) >= limit:
+            worst = p
+            worst_key = self._eviction_key(len(p.indexes), p.serial)
+            for part in self.mixed_parts.values():
+                key = self._eviction_key(len(part.indexes), part.serial)
+                if key > worst_key:
+                    worst = part
+                    worst_key = key
+            self._evict(worst.seq_nums)
+            self.release_buffer(worst.data)
+            if worst is p:
+                return
+            del self.mixed_parts[worst.mask]
+            self._unlink_mixed_part(worst, worst.indexes)
+        self.mixed_parts[p.mask] = p
+        fragment_parts = self.fragment_parts
+        for i in p.indexes:
+            parts = fragment_parts.get(i)
+            if parts is None:
+                fragment_parts[i] = {p}
+            else:
+                parts.add(p)
+
+    def _mixed_parts_limit(self):
+        """How many unresolved parts may be held, None if unbounded"""
+        limit = self.max_mixed_parts
+        if self.max_mixed_bytes is not None and self.expected_fragment_len:
+            by_bytes = self.max_mixed_bytes // self.expected_fragment_len
+            limit = by_bytes if limit is None else min(limit, by_bytes)
+        return limit
+
+    def _eviction_key(self, degree, serial):
+        # The highest key is evicted first
+        if self.eviction_policy == self.EVICT_OLDEST:
+            return -serial
+        return degree, -serial
+
+    def _evict(self, seq_nums):
+        """Count an eviction and forget the parts that were XORed into the
+        evicted one: at least one of them brings its information back"""
+        self.evicted_parts_count += 1
+        if self.stats is not None:
+            self.stats.count("evictions")
+        for seq_num in seq_nums:
+            self.received_seq_nums.discard(seq_num)
+            if self.on_forget is not None:
+                self.on_forget(seq_num)
+
+    def _unlink_mixed_part(self, p, indexes):
+        fragment_parts = self.fragment_parts
+        for i in indexes:
+            parts = fragment_parts[i]
+            parts.discard(p)
+            if not parts:
+                del fragment_parts[i]
 
     def reduce_mixed_by(self, p):
-        new_mixed = {}
-        for value in self.mixed_parts.values():
-            reduced = self.reduced_part_by_part(value, p)
-            if reduced.is_simple():
-                self.queued_parts.append(reduced)
+        # Only mixed parts containing every fragment of `p` can be reduced by
+        # it, so take the candidates from its least shared fragment
+        candidates = None
+        for i in p.indexes:
+            parts = self.fragment_parts.get(i)
+            if parts is None:
+                return
+            if candidates is None or len(parts) < len(candidates):
+                candidates = parts
+        if candidates is None:
+            return
+
+        p_mask = p.mask
+        mixed_parts = self.mixed_parts
+        for part in list(candidates):
+            mask = part.mask
+            if mask & p_mask != p_mask or mask == p_mask:
+                continue
+
+            # Reduce the part in place: it only leaves the index lists of
+            # the fragments of `p`
+            del mixed_parts[mask]
+            self._unlink_mixed_part(part, p.indexes)
+            part.reduce_by(p)
+            if self.stats is not None:
+                self._count_reduction()
+
+            if part.is_simple():
+                self._unlink_mixed_part(part, part.indexes)
+                self.queued_parts.append(part)
+            elif part.mask in mixed_parts:
+                # Reduced to a part we already have
+                self._unlink_mixed_part(part, part.indexes)
+                self.release_buffer(part.data)
             else:
-                new_mixed[reduced.indexes] = reduced
-        self.mixed_parts = new_mixed
+                mixed_parts[part.mask] = part
 
     def reduced_part_by_part(self, a, b):
         # If the fragments mixed into `b` are a strict (proper) subset of those in `a`...
-        if b.indexes.issubset(a.indexes) and b.indexes != a.indexes:
-            # The new fragments in the revised part are `a` - `b`
-            new_indexes = a.indexes.difference(b.indexes)
-            # The new data in the revised part are `a` XOR `b`
-            new_data = bytearray(a.data)
-            xor_into(new_data, b.data)
-
-            return self.Part(new_indexes, new_data)
-
-        # `a` is not reducable by `b`, so return a
+        if a.mask & b.mask == b.mask and a.mask != b.mask:
+            # `a` becomes `a` - `b` and its data `a` XOR `b`, in place
+            # (a resolved fragment kept in an output file is read back)
+            a.reduce_by(b, self._read_fragment(b.index()) if b.data is None else None)
+            if self.stats is not None:
+                self._count_reduction()
+
+        # otherwise `a` is not reducable by `b`
         return a
 
+    def _count_reduction(self):
+        self.stats.count("reductions")
+        self.stats.count("xor_bytes", self.expected_fragment_len)
+
     def process_simple_part(self, p):
         # Don't process duplicate parts
         fragment_index = p.index()
         if fragment_index in self.received_part_indexes:
+            self.release_buffer(p.data)
             return
 
-        # Record this part
-        self.simple_parts[p.indexes] = p
+        # Record this part, its data now lives in the message
         self.received_part_indexes.add(fragment_index)
+        slot = self.store_fragment(fragment_index, p.data)
+        p.seq_nums = None
 
         # If we've received all the parts
         if self.received_part_indexes == self.expected_part_indexes:
-            # Reassemble the message from its fragments
-            fragments = [None] * self.expected_part_count()
-            for part in self.simple_parts.values():
-                fragments[part.index()] = part.data
-
-            message = self.join_fragments(fragments, self.expected_message_len)
-
-            # Verify the message checksum and note success or failure
-            checksum = crc32(message)
-            if checksum == self.expected_checksum:
-                self.result = bytes(message)
-            else:
-                self.result = InvalidChecksum()
-
-            self._clear_caches()
+            self.finish()
 
         else:
             # Reduce all the mixed parts by this part
             self.reduce_mixed_by(p)
+            self.release_buffer(p.data)
+            p.data = slot
+            self.simple_parts[fragment_index] = p
+
+    def _fragment_range(self, index):
+        start = index * self.expected_fragment_len
+        return start, min(start + self.expected_fragment_len, self.expected_message_len)
+
+    def store_fragment(self, index, data):
+        """Write a resolved fragment (minus padding) into the message and
+        return a view of its slot, or None when the output is a file"""
+        start, end = self._fragment_range(index)
+        data = memoryview(data)[: end - start]
+        if self.message is None:
+            self.output.seek(start)
+            self.output.write(data)
+            slot = None
+        else:
+            slot = memoryview(self.message)[start:end]
+            slot[:] = data
+        self._update_crc()
+        return slot
+
+    def _read_fragment(self, index):
+        """View of a resolved fragment, zero padded to the fragment length.
+        When it is read back from the output file the view is only valid
+        until the next call."""
+        start, end = self._fragment_range(index)
+        if self.message is not None and end - start == self.expected_fragment_len:
+            return memoryview(self.message)[start:end]
+        if self.fragment_buffer is None:
+            self.fragment_buffer = bytearray(self.expected_fragment_len)
+        buf = memoryview(self.fragment_buffer)
+        if self.message is None:
+            self.output.seek(start)
+            pos = start
+            while pos < end:
+                n = self.output.readinto(buf[pos - start : end - start])
+                if not n:
+                    raise EOFError("Output file is shorter than the fragments written")
+                pos += n
+        else:
+            buf[: end - start] = memoryview(self.message)[start:end]
+        buf[end - start :] = bytes(self.expected_fragment_len - (end - start))
+        return buf
+
+    def _update_crc(self):
+        frag_len = self.expected_fragment_len
+        msg_len = self.expected_message_len
+        while (
+            self.crc_len < msg_len
+            and self.crc_len // frag_len in self.received_part_indexes
+        ):
+            end = min(self.crc_len + frag_len, msg_len)
+            if self.message is None:
+                fragment = self._read_fragment(self.crc_len // frag_len)
+                self.crc.update(fragment[: end - self.crc_len])
+            else:
+                self.crc.update(memoryview(self.message)[self.crc_len : end])
+            self.crc_len = end
+
+    def finish(self):
+        # Verify the message checksum and note success or failure
+        if (
+            self.crc_len == self.expected_message_len
+            and self.crc.value() == self.expected_checksum
+        ):
+            self.result = self.message if self.output is None else self.output
+            if self.message is None and hasattr(self.output, "flush"):
+                self.output.flush()
+        else:
+            self.result = InvalidChecksum()
+
+        self._clear_caches()
 
     def process_mixed_part(self, p):
         # Don't process duplicate parts
-        for r in self.mixed_parts.values():
-            if r == p.indexes:
-                return
+        if p.mask in self.mixed_parts:
+            self.release_buffer(p.data)
+            return
 
-        # Reduce this part by all the others
+        # Reduce this part by all the others: the simple parts of its fragments
         reduced = p
-        for r in self.simple_parts.values():
-            reduced = self.reduced_part_by_part(reduced, r)
+        simple_parts = self.simple_parts
+        for i in p.indexes:
+            r = simple_parts.get(i)
+            if r is not None:
+                reduced = self.reduced_part_by_part(reduced, r)
 
-        for r in self.mixed_parts.values():
-            reduced = self.reduced_part_by_part(reduced, r)
+        # and the mixed parts whose fragments it contains
+        for mask, r in self.mixed_parts.items():
+            if mask & reduced.mask == mask:
+                reduced = self.reduced_part_by_part(reduced, r)
 
         # If the part is now simple
         if reduced.is_simple():
@@ -203,7 +530,92 @@ class FountainDecoder(BasicDecoder):
             # Reduce all the mixed parts by this one
             self.reduce_mixed_by(reduced)
             # Record this new mixed part
-            self.mixed_parts[reduced.indexes] = reduced
+            self.add_mixed_part(reduced)
+
+    def eliminate_part(self, p):
+        mask = p.mask
+
+        data = p.data
+        seq_nums = p.seq_nums
+
+        # Reduce the new row by every pivot it contains. Rows never contain
+        # another row's pivot, so a single pass leaves none of them in it.
+        for pivot, row in self.rows.items():
+            if mask & pivot:
+                mask ^= row[0]
+                if seq_nums is not None and row[3] is not None:
+                    seq_nums = seq_nums ^ row[3]
+                if row[1] is None:
+                    # Solved row whose fragment was written to the output file
+                    xor_into(data, self._read_fragment(bit_index(pivot)))
+                else:
+                    xor_into(data, row[1])
+                if self.stats is not None:
+                    self._count_reduction()
+
+        # Linearly dependent on what we already have
+        if not mask:
+            self.release_buffer(data)
+            return
+
+        if mask & (mask - 1) and self._evict_row(mask, p.serial, seq_nums):
+            self.release_buffer(data)
+            return
+
+        # Clear the new pivot out of the other rows to keep the form reduced
+        changed = []
+        pivot = mask & -mask
+        for row in self.rows.values():
+            if row[0] & pivot:
+                row[0] ^= mask
+                xor_into(row[1], data)
+                if row[3] is not None and seq_nums is not None:
+                    row[3] = row[3] ^ seq_nums
+                if self.stats is not None:
+                    self._count_reduction()
+                changed.append(row)
+        row = [mask, data, p.serial, seq_nums]
+        self.rows[pivot] = row
+        changed.append(row)
+
+        # Rows with a single bit left are solved fragments, and stay so
+        for row in changed:
+            row_mask = row[0]
+            if not row_mask & (row_mask - 1):
+                index = bit_index(row_mask)
+                self.received_part_indexes.add(index)
+                slot = self.store_fragment(index, row[1])
+                self.release_buffer(row[1])
+                row[1] = slot
+                row[3] = None
+
+        # Full rank: every row is a single fragment
+        if len(self.rows) == self.expected_part_count():
+            self.finish()
+
+    def _evict_row(self, mask, serial, seq_nums):
+        """When the rows are full, evict an unsolved one or the new one, and
+        return whether it was the new one"""
+        limit = self._mixed_parts_limit()
+        if limit is None or len(self.rows) - len(self.received_part_indexes) < limit:
+            return False
+        # Rows never contain another row's pivot, so dropping one leaves the
+        # others reduced
+        worst = None
+        worst_key = self._eviction_key(bin(mask).count("1"), serial)
+        worst_seq_nums = seq_nums
+        for pivot, row in self.rows.items():
+            if row[0] & (row[0] - 1):
+                key = self._eviction_key(bin(row[0]).count("1"), row[2])
+                if key > worst_key:
+                    worst = pivot
+                    worst_key = key
+                    worst_seq_nums = row[3]
+        self._evict(worst_seq_nums)
+        if worst is None:
+            return True
+        self.release_buffer(self.rows.pop(worst)[1])
+        return False
 
     def validate_part(self, p):
         # If this is the first part we've seen
@@ -212,6 +624,8 @@ class FountainDecoder(BasicDecoder):
             self.expected_message_len = p.message_len
             self.expected_checksum = p.checksum
             self.expected_fragment_len = len(p.data)
+            self.message = self._open_output(p.message_len)
+            self.sampler = get_degree_sampler(p.seq_len)
         else:
             if (
                 self.expected_part_count() != p.seq_len
@@ -222,3 +636,31 @@ class FountainDecoder(BasicDecoder):
                 return False
 
         return True
+
+    def store_message(self, message):
+        """Write a whole message, e.g. of a single-part UR, to the output and
+        return the result: the output, or the message itself without one"""
+        if self.output is None:
+            return message
+        buf = self._open_output(len(message))
+        if buf is None:
+            self.output.seek(0)
+            self.output.write(message)
+            if hasattr(self.output, "flush"):
+                self.output.flush()
+        else:
+            memoryview(buf)[: len(message)] = message
+        return self.output
+
+    def _open_output(self, message_len):
+        """The buffer resolved fragments are written to, None for a file"""
+        if self.output is None:
+            return bytearray(message_len)
+        try:
+            view = memoryview(self.output)
+        except TypeError:
+            # A file: fragments are written at their offset with seek/write
+            return None
+        if len(view) < message_len:
+            raise ValueError("Output buffer is smaller than the message")
+        return self.output
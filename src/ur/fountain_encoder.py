@@ -6,10 +6,10 @@
 #
 
 from .cbor_lite import CBORDecoder, CBOREncoder
-from .fountain_utils import choose_fragments, reset_degree_cache
+from .fountain_utils import choose_fragments, get_degree_sampler, FragmentSchedule
 from .utils import xor_into
 from .constants import MAX_UINT32
-from .crc32 import crc32
+from .crc32 import crc32, CRC32
 
 
 class Part:
@@ -26,7 +26,7 @@ class Part:
     @staticmethod
     def from_cbor(cbor_buf):
         decoder = CBORDecoder(cbor_buf)
-        (array_size, _) = decoder.decodeArraySize()
+        array_size, _ = decoder.decodeArraySize()
         if array_size != 5:
             raise ValueError("Invalid header")
 
@@ -50,17 +50,51 @@ class Part:
 
 
 class FountainEncoder:
-    def __init__(self, message, max_fragment_len, first_seq_num=0, min_fragment_len=10):
-        assert isinstance(message, bytearray)
-        assert len(message) <= MAX_UINT32
+    # schedule_window > 0 precomputes the fragment indexes of that many
+    # upcoming parts and keeps up to schedule_size of them cached
+    def __init__(
+        self,
+        message,
+        max_fragment_len,
+        first_seq_num=0,
+        min_fragment_len=10,
+        schedule_window=0,
+        schedule_size=256,
+        stats=None,
+        checksum=None,
+    ):
+        # stats: an optional ur.stats.Stats timing the encoding stages
+        # checksum: the CRC32 of the message when already known, e.g. by the
+        # process that splits the encoding between workers
+        self.stats = stats
+        self.message_len, self.checksum = self.load_message(message, checksum)
+        assert self.message_len <= MAX_UINT32
 
-        self.message = message
-        self.message_len = len(message)
-        self.checksum = crc32(message)
         self.fragment_len = self.find_nominal_fragment_length(
             self.message_len, min_fragment_len, max_fragment_len
         )
+        self._seq_len = (self.message_len + self.fragment_len - 1) // self.fragment_len
         self.seq_num = first_seq_num
+        # Own reference to the degree sampler: instances in other threads
+        # never contend on (or evict) it
+        self.sampler = get_degree_sampler(self.seq_len())
+        self.schedule = None
+        if schedule_window > 0:
+            self.schedule = FragmentSchedule(
+                self.seq_len(),
+                self.checksum,
+                schedule_window,
+                schedule_size,
+                self.sampler,
+            )
+
+    # Keep the message, return its length and checksum
+    def load_message(self, message, checksum=None):
+        assert isinstance(message, bytearray)
+        self.message = message
+        if checksum is None:
+            checksum = crc32(message)
+        return len(message), checksum
 
     @staticmethod
     def find_nominal_fragment_length(message_len, min_fragment_len, max_fragment_len):
@@ -72,16 +106,12 @@ class FountainEncoder:
         return max_fragment_len
 
     def seq_len(self):
-        return (self.message_len + self.fragment_len - 1) // self.fragment_len
+        return self._seq_len
 
     # This becomes `true` when the minimum number of parts
     # to relay the complete message have been generated
     def is_complete(self):
-        if self.seq_num >= self.seq_len():
-            # Decode / Encoder operations don't usually happen in parallel, otherwise reset_degree_cache() will need to be removed from here
-            reset_degree_cache()  # reset the cache for next_part -> choose_fragments -> choose_degree
-            return True
-        return False
+        return self.seq_num >= self.seq_len()
 
     # True if only a single part will be generated.
     def is_single_part(self):
@@ -90,12 +120,26 @@ class FountainEncoder:
     def next_part(self):
         self.seq_num = (self.seq_num + 1) % MAX_UINT32
 
-        indexes = choose_fragments(self.seq_num, self.seq_len(), self.checksum)
+        stats = self.stats
+        if stats is not None:
+            t = stats.start()
+
+        if self.schedule is not None:
+            indexes = self.schedule.get(self.seq_num)
+        else:
+            indexes = choose_fragments(
+                self.seq_num, self._seq_len, self.checksum, self.sampler
+            )
+        if stats is not None:
+            t = stats.stop("choose_fragments", t)
         mixed = self.mix(indexes)
+        if stats is not None:
+            stats.stop("mix", t)
+            stats.count("xor_bytes", len(indexes) * self.fragment_len)
 
         return Part(
             self.seq_num,
-            self.seq_len(),
+            self._seq_len,
             self.message_len,
             self.checksum,
             mixed,
@@ -103,7 +147,7 @@ class FountainEncoder:
 
     def mix(self, indexes):
         result = bytearray(self.fragment_len)
-        msg = self.message
+        msg = memoryview(self.message)  # slice without copying
         frag_len = self.fragment_len
         msg_len = self.message_len
 
@@ -115,3 +159,69 @@ class FountainEncoder:
             xor_into(result, msg[start:end])
 
         return result
+
+
+class StreamFountainEncoder(FountainEncoder):
+    """FountainEncoder over a message that isn't loaded into RAM: a seekable
+    binary file, or any buffer protocol object (bytes, mmap, ...). The CRC
+    is computed in one streaming pass, unless given, and each part only reads
+    the fragments it mixes. Encoders may share a read-only mmap; a file object should only
+    be used by one encoder at a time since reads move its position"""
+
+    CHUNK_SIZE = 4096
+
+    def load_message(self, message, checksum=None):
+        crc = CRC32()
+        if hasattr(message, "readinto"):
+            self.file = message
+            self.message = None
+            if checksum is not None:
+                return message.seek(0, 2), checksum
+            buf = bytearray(self.CHUNK_SIZE)
+            message_len = 0
+            message.seek(0)
+            while True:
+                n = message.readinto(buf)
+                if not n:
+                    break
+                crc.update(memoryview(buf)[:n])
+                message_len += n
+        else:
+            self.file = None
+            self.message = memoryview(message)
+            message_len = len(self.message)
+            if checksum is not None:
+                return message_len, checksum
+            crc.update(self.message)
+        return message_len, crc.value()
+
+    def read_into(self, buf, start):
+        f = self.file
+        f.seek(start)
+        view = memoryview(buf)
+        pos = 0
+        while pos < len(buf):
+            n = f.readinto(view[pos:])
+            if not n:
+                raise ValueError("Message file is shorter than when encoding started")
+            pos += n
+
+    def mix(self, indexes):
+        if self.file is None:
+            return super().mix(indexes)
+
+        result = bytearray(self.fragment_len)
+        fragment = bytearray(self.fragment_len)
+        frag_len = self.fragment_len
+        msg_len = self.message_len
+
+        for index in indexes:
+            start = index * frag_len
+            if start >= msg_len:
+                continue
+            end = min(start + frag_len, msg_len)
+            chunk = memoryview(fragment)[: end - start]
+            self.read_into(chunk, start)
+            xor_into(result, chunk)
+
+        return result
@@ -6,17 +6,41 @@
 #
 
 from array import array
+from .constants import MAX_UINT32
 from .utils import int_to_bytes
 from .xoshiro256 import Xoshiro256
 
+try:
+    from _thread import allocate_lock
+except ImportError:
+    allocate_lock = None
+
+# Default RAM budget of the degree sampler cache, the most recently used
+# sampler is always kept even if it alone is bigger
+DEGREE_CACHE_MAX_BYTES = 32768
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
 
 class _DegreeSamplerCache:
-    """Cache for choose_fragments -> choose_degree depended on seq_len"""
+    """LRU cache for choose_fragments -> choose_degree samplers keyed by seq_len.
+    Samplers are never modified once built, so callers may keep using one
+    after it has been evicted"""
 
     class RandomSampler:
+        __slots__ = ("probs", "aliases", "nbytes")
+
         def __init__(self, probs, aliases):
             self.probs = probs
             self.aliases = aliases
+            # 4 bytes per float prob + 1 or 2 bytes per alias
+            self.nbytes = len(probs) * (5 if len(probs) < 256 else 6)
 
         def next(self, rng_func):
             r1 = rng_func()
@@ -24,15 +48,50 @@ class _DegreeSamplerCache:
             i = int(r1 * len(self.probs))
             return i if r2 < self.probs[i] else self.aliases[i]
 
-    def __init__(self):
-        self.seq_len = None
-        self.sampler = None
+    def __init__(self, max_bytes=DEGREE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._samplers = {}
+        self._lru = []  # seq_lens, least recently used first
+        self._lock = allocate_lock() if allocate_lock else _NoLock()
 
     def get(self, seq_len):
-        if self.seq_len != seq_len:
-            self.seq_len = seq_len
-            self.sampler = self._build(seq_len)
-        return self.sampler
+        with self._lock:
+            sampler = self._samplers.get(seq_len)
+            if sampler is not None:
+                if self._lru[-1] != seq_len:
+                    self._lru.remove(seq_len)
+                    self._lru.append(seq_len)
+                return sampler
+
+        # Build outside the lock so other seq_lens aren't blocked meanwhile
+        sampler = self._build(seq_len)
+
+        with self._lock:
+            existing = self._samplers.get(seq_len)
+            if existing is not None:
+                # Another thread built it first
+                return existing
+            self._samplers[seq_len] = sampler
+            self._lru.append(seq_len)
+            self.nbytes += sampler.nbytes
+            self._evict()
+        return sampler
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._samplers.clear()
+            self._lru.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._lru) > 1:
+            self.nbytes -= self._samplers.pop(self._lru.pop(0)).nbytes
 
     def _build(self, seq_len):
         # Pre-calculate total for harmonic distribution
@@ -82,47 +141,102 @@ class _DegreeSamplerCache:
 _degree_cache = _DegreeSamplerCache()
 
 
-def choose_degree(seq_len, rng):
-    sampler = _degree_cache.get(seq_len)
+# Samplers are immutable, so an encoder / decoder can fetch its own once
+# and pass it to choose_fragments() without touching the shared cache again
+def get_degree_sampler(seq_len):
+    return _degree_cache.get(seq_len)
+
+
+def choose_degree(seq_len, rng, sampler=None):
+    if sampler is None:
+        sampler = _degree_cache.get(seq_len)
     return sampler.next(rng.next_double) + 1
 
 
+def set_degree_cache_limit(max_bytes):
+    _degree_cache.set_max_bytes(max_bytes)
+
+
+# Drop all cached samplers to free their RAM
 def reset_degree_cache():
-    sampler = _degree_cache.sampler
-    if sampler:
-        sampler.probs = None
-        sampler.aliases = None
-    _degree_cache.seq_len = None
-    _degree_cache.sampler = None
+    _degree_cache.clear()
 
 
-def choose_fragments(seq_num, seq_len, checksum):
+def choose_fragments(seq_num, seq_len, checksum, sampler=None):
     if seq_num <= seq_len:
         return frozenset([seq_num - 1])
 
     seed = int_to_bytes(seq_num) + int_to_bytes(checksum)
     rng = Xoshiro256.from_bytes(seed)
-    degree = choose_degree(seq_len, rng)
-
-    # Choose smallest array type based on seq_len
-    if seq_len < 256:
-        remaining = array("B", range(seq_len))
-    elif seq_len < 65536:
-        remaining = array("H", range(seq_len))
-    else:
-        remaining = array("I", range(seq_len))
-    result = set()
-
-    for _ in range(degree):
-        j = rng.next_int(0, len(remaining) - 1)
-
-        v = remaining[j]
-        result.add(v)
+    degree = choose_degree(seq_len, rng, sampler)
+
+    # Picking position j of the remaining values is the same as popping
+    # remaining[j] from a list of range(seq_len), but only the chosen values
+    # are stored, sorted. Since result[i] - i counts the values not taken
+    # below result[i], a binary search finds how many taken values precede
+    # the j-th remaining one.
+    result = []
+    for remaining in range(seq_len, seq_len - degree, -1):
+        j = rng.next_int(0, remaining - 1)
+        lo = 0
+        hi = len(result)
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if result[mid] - mid <= j:
+                lo = mid + 1
+            else:
+                hi = mid
+        result.insert(lo, j + lo)
 
-        # emulate array.pop(j)
-        for k in range(j, len(remaining) - 1):
-            remaining[k] = remaining[k + 1]
+    return frozenset(result)
 
-        remaining = remaining[:-1]
 
-    return frozenset(result)
+class FragmentSchedule:
+    """Bounded cache of choose_fragments() results for one message.
+    Index sets only depend on (seq_num, seq_len, checksum), so they are
+    computed for a window of upcoming seq_nums at once and served again
+    when the same seq_nums come around (e.g. a looping animated QR)"""
+
+    def __init__(self, seq_len, checksum, window=16, max_size=256, sampler=None):
+        self.seq_len = seq_len
+        self.checksum = checksum
+        self.sampler = sampler
+        self.window = window
+        self.max_size = max(max_size, window)
+        self._cache = {}
+        # Ring of cached keys, oldest is overwritten first
+        self._keys = [None] * self.max_size
+        self._next = 0
+
+    def get(self, seq_num):
+        # Simple parts are cheap, don't waste cache slots on them
+        if seq_num <= self.seq_len:
+            return choose_fragments(seq_num, self.seq_len, self.checksum, self.sampler)
+
+        indexes = self._cache.get(seq_num)
+        if indexes is None:
+            self._fill(seq_num)
+            indexes = self._cache[seq_num]
+        return indexes
+
+    def _fill(self, seq_num):
+        for i in range(self.window):
+            n = (seq_num + i) % MAX_UINT32
+            if n <= self.seq_len or n in self._cache:
+                continue
+            self._store(
+                n, choose_fragments(n, self.seq_len, self.checksum, self.sampler)
+            )
+
+    def _store(self, seq_num, indexes):
+        old = self._keys[self._next]
+        if old is not None:
+            del self._cache[old]
+        self._keys[self._next] = seq_num
+        self._next = (self._next + 1) % self.max_size
+        self._cache[seq_num] = indexes
+
+    def clear(self):
+        self._cache.clear()
+        self._keys = [None] * self.max_size
+        self._next = 0
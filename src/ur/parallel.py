@@ -0,0 +1,144 @@
+#
+# parallel.py
+#
+# Copyright © 2020 Foundation Devices, Inc.
+# Licensed under the "BSD-2-Clause Plus Patent License"
+#
+
+# CPython only: renders a range of parts of a multi-part UR on several cores.
+# A part only depends on its seq_num and the message, so the seq_num range is
+# split in chunks and every worker process runs its own UREncoder over the
+# shared message, starting at the seq_num before its chunk, with the checksum
+# computed once here.
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .constants import MAX_UINT32
+from .ur import UR
+from .ur_encoder import UREncoder
+
+
+def encode_parts(
+    ur,
+    max_fragment_len,
+    count,
+    first_seq_num=0,
+    min_fragment_len=10,
+    workers=None,
+    chunk_size=None,
+    executor=None,
+):
+    """The `count` parts that follow `first_seq_num`, in order: the same
+    strings as UREncoder(ur, max_fragment_len, first_seq_num).next_parts(count)
+
+    `ur.cbor` is copied once into shared memory, or when it is a file opened
+    from a path, every worker maps that file instead. Other file objects,
+    e.g. an io.BytesIO, are read once into shared memory. Pass an `executor` to
+    reuse a pool across calls (`workers` then only sizes the chunks),
+    otherwise one of `workers` processes, by default one per core, is made.
+    """
+    encoder = UREncoder(ur, max_fragment_len, first_seq_num, min_fragment_len)
+    if encoder.is_single_part() or count <= 0:
+        return encoder.next_parts(count)
+    # Workers reuse the checksum instead of each reading the whole message
+    checksum = encoder.fountain_encoder.checksum
+    del encoder
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker to even out the load
+        chunk_size = max(1, -(-count // (workers * 4)))
+    chunks = [
+        ((first_seq_num + start) % MAX_UINT32, min(chunk_size, count - start))
+        for start in range(0, count, chunk_size)
+    ]
+
+    source, shm = _share_message(ur.cbor)
+    try:
+        return _encode_chunks(
+            executor,
+            workers,
+            (ur.type, source, checksum, max_fragment_len, min_fragment_len),
+            chunks,
+        )
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def _share_message(message):
+    # Where workers find the message, and the shared memory made for it
+    if hasattr(message, "readinto"):
+        path = getattr(message, "name", None)
+        if isinstance(path, str):
+            return ("file", path), None
+        # No path to map, e.g. io.BytesIO or tempfile.TemporaryFile()
+        size = message.seek(0, 2)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        message.seek(0)
+        pos = 0
+        while pos < size:
+            with shm.buf[pos:size] as view:
+                n = message.readinto(view)
+            if not n:
+                shm.close()
+                shm.unlink()
+                raise ValueError("Message file is shorter than its size")
+            pos += n
+        return ("shm", shm.name, size), shm
+    view = memoryview(message)
+    shm = shared_memory.SharedMemory(create=True, size=len(view))
+    shm.buf[: len(view)] = view
+    return ("shm", shm.name, len(view)), shm
+
+
+def _encode_chunks(executor, workers, args, chunks):
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+    try:
+        futures = [
+            executor.submit(_encode_range, *args, first_seq_num, count)
+            for first_seq_num, count in chunks
+        ]
+        parts = []
+        for future in futures:
+            parts.extend(future.result())
+        return parts
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def _encode_range(
+    ur_type, source, checksum, max_fragment_len, min_fragment_len, first_seq_num, count
+):
+    # Runs in a worker process
+    if source[0] == "file":
+        with open(source[1], "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        message = memoryview(buf)
+    else:
+        buf = shared_memory.SharedMemory(name=source[1])
+        message = buf.buf[: source[2]]
+
+    try:
+        encoder = UREncoder(
+            UR(ur_type, message),
+            max_fragment_len,
+            first_seq_num,
+            min_fragment_len,
+            checksum=checksum,
+        )
+        parts = encoder.next_parts(count)
+    finally:
+        # Views must be gone before the mapping is closed
+        encoder = None
+        message.release()
+        buf.close()
+    return parts
@@ -0,0 +1,67 @@
+#
+# stats.py
+#
+# Copyright © 2020 Foundation Devices, Inc.
+# Licensed under the "BSD-2-Clause Plus Patent License"
+#
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+class Stats:
+    """Time spent in each stage of encoding or decoding, and counters.
+
+    Encoders and decoders take one as `stats=`, and only time and count
+    when it's given. `callback(stage, us)` is called after every timed stage,
+    e.g. to feed a histogram"""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.times = {}  # stage -> total us
+        self.calls = {}  # stage -> times run
+        self.counters = {}
+        self.peaks = {}  # highest values of gauges
+
+    def start(self):
+        return ticks_us()
+
+    def stop(self, stage, start):
+        """Account the time since `start` to `stage`, return the time now to
+        start the next stage"""
+        now = ticks_us()
+        us = ticks_diff(now, start)
+        self.times[stage] = self.times.get(stage, 0) + us
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self.callback is not None:
+            self.callback(stage, us)
+        return now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def peak(self, name, value):
+        if value > self.peaks.get(name, 0):
+            self.peaks[name] = value
+
+    def reset(self):
+        self.times.clear()
+        self.calls.clear()
+        self.counters.clear()
+        self.peaks.clear()
+
+    def report(self):
+        return {
+            "times_us": dict(self.times),
+            "calls": dict(self.calls),
+            "counters": dict(self.counters),
+            "peaks": dict(self.peaks),
+        }
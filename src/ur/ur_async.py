@@ -0,0 +1,126 @@
+#
+# ur_async.py
+#
+# Copyright © 2020 Foundation Devices, Inc.
+# Licensed under the "BSD-2-Clause Plus Patent License"
+#
+
+# asyncio front-ends (CPython): the decoding and encoding work runs in an
+# executor so that camera and display loops keep their event loop free.
+# The wrapped decoder or encoder must then only be used through them.
+
+import asyncio
+
+from .ur_decoder import URDecoder
+
+
+class AsyncURDecoder:
+    def __init__(self, decoder=None, executor=None):
+        self.decoder = URDecoder() if decoder is None else decoder
+        # None is the loop's default executor
+        self.executor = executor
+        # The decoder isn't thread-safe: one executor call at a time
+        self.lock = asyncio.Lock()
+        self.changed = asyncio.Event()
+
+    def is_complete(self):
+        return self.decoder.is_complete()
+
+    async def run(self, func, *args):
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, func, *args)
+        # Wake up the waiters of this change, the next ones wait for another
+        self.changed.set()
+        self.changed = asyncio.Event()
+        return result
+
+    async def receive_part(self, part):
+        return await self.run(self.decoder.receive_part, part)
+
+    async def receive_parts(self, parts):
+        return await self.run(self.decoder.receive_parts, parts)
+
+    async def consume(self, parts):
+        """Receive the strings of an async iterator until the UR is complete
+        and return the result. Frames that come in while the executor is
+        busy are received together in the next batch"""
+        batch = []
+        running = None
+        async for part in parts:
+            batch.append(part)
+            if running is not None:
+                if not running.done():
+                    continue
+                running.result()
+            if self.is_complete():
+                break
+            running = asyncio.ensure_future(self.receive_parts(batch))
+            batch = []
+
+        if running is not None:
+            await running
+        if batch and not self.is_complete():
+            await self.receive_parts(batch)
+        return self.decoder.result
+
+    async def progress(self):
+        """Wait for the next part to be received and return the estimated
+        completion"""
+        await self.changed.wait()
+        return self.decoder.estimated_percent_complete()
+
+    async def wait_complete(self):
+        while not self.is_complete():
+            await self.changed.wait()
+        return self.decoder.result
+
+
+class AsyncUREncoder:
+    """Renders the parts of a UREncoder in an executor ahead of an async
+    consumer. At most `max_queued` parts wait for it: a slow display holds
+    the encoder back instead of letting parts pile up"""
+
+    def __init__(self, encoder, max_queued=4, executor=None):
+        self.encoder = encoder
+        self.executor = executor
+        self.queue = asyncio.Queue(max_queued)
+        self.task = None
+
+    async def produce(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            part = await loop.run_in_executor(self.executor, self.encoder.next_part)
+            await self.queue.put(part)
+
+    async def next_part(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.produce())
+        get = asyncio.ensure_future(self.queue.get())
+        await asyncio.wait((get, self.task), return_when=asyncio.FIRST_COMPLETED)
+        if not get.done():
+            # The producer stopped: raise its error
+            get.cancel()
+            self.task.result()
+        return get.result()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.next_part()
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc):
+        await self.close()
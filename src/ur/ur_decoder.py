@@ -14,10 +14,37 @@ from .basic_decoder import BasicDecoder
 
 class URDecoder(BasicDecoder):
     # Start decoding a (possibly) multi-part UR
-    def __init__(self):
+    # stats: an optional ur.stats.Stats timing the decoding stages, see
+    # FountainDecoder for the other options
+    def __init__(
+        self,
+        use_elimination=False,
+        output=None,
+        max_mixed_parts=None,
+        stats=None,
+        max_mixed_bytes=None,
+        eviction_policy=FountainDecoder.EVICT_HIGHEST_DEGREE,
+        compaction_threshold=8,
+    ):
         super().__init__()
-        self.fountain_decoder = FountainDecoder()
+        self.stats = stats
+        self.fountain_decoder = FountainDecoder(
+            use_elimination,
+            output,
+            max_mixed_parts,
+            stats,
+            max_mixed_bytes,
+            eviction_policy,
+            compaction_threshold,
+        )
         self.expected_type = None
+        # Keys of the accepted frames, so repeated frames skip Bytewords and
+        # CBOR decoding, see frame_key()
+        self.received_seqs = set()
+        # seq_num -> key, to forget the frames of parts evicted under a budget
+        self.seq_num_keys = {}
+        self.fountain_decoder.on_forget = self.forget_part
+        self.dropped_parts_count = 0
 
     # Decode a single-part UR
     @staticmethod
@@ -66,6 +93,13 @@ class URDecoder(BasicDecoder):
             raise ValueError("Invalid sequence component")
         return a, b
 
+    @staticmethod
+    def frame_key(seq, fragment):
+        """The sequence component and the Bytewords CRC of the fragment
+        (its last 4 minimal words): a frame of another transfer that reuses
+        the same seq label has another key, and still gets rejected"""
+        return seq + b"/" + fragment[-8:]
+
     def validate_part(self, _type):
         if self.expected_type is None:
             # remove unnecessary check
@@ -79,35 +113,152 @@ class URDecoder(BasicDecoder):
         if self.result is not None:
             return False
 
+        stats = self.stats
+        if stats is not None:
+            t = stats.start()
+
         _type, payload, is_multi = URDecoder.parse(part)
         if not self.validate_part(_type):
             return False
 
         if not is_multi:
-            body = payload
-            cbor = BytewordsDecoder.decode(body)
+            cbor = BytewordsDecoder.decode(payload)
+            cbor = self.fountain_decoder.store_message(cbor)
             self.result = UR(_type.decode(), cbor)
             return True
 
         seq, fragment = payload
+        key = URDecoder.frame_key(seq, fragment)
+        if key in self.received_seqs:
+            self.dropped_parts_count += 1
+            if stats is not None:
+                stats.count("duplicates")
+            return True
+
         seq_num, seq_len = URDecoder.parse_sequence_component(seq)
+        if stats is not None:
+            t = stats.stop("parse", t)
 
         cbor = BytewordsDecoder.decode(fragment)
+        if stats is not None:
+            t = stats.stop("decode_bytewords", t)
         part = FountainEncoderPart.from_cbor(cbor)
+        if stats is not None:
+            t = stats.stop("decode_cbor", t)
 
         if seq_num != part.seq_num or seq_len != part.seq_len:
             return False
 
-        if not self.fountain_decoder.receive_part(part):
+        accepted = self.accept_part(key, part)
+        if stats is not None:
+            stats.stop("fountain", t)
+        if not accepted:
             return False
 
+        if self.fountain_decoder.is_complete():
+            self.finish()
+
+        return True
+
+    def receive_parts(self, parts, batch_size=None):
+        """Receive many parts at once, e.g. from a recording or an upload.
+        Their Bytewords and CBOR are decoded in one loop and the fountain
+        decoder only peels them at the end, or every `batch_size` accepted
+        parts for an endless iterable. Unlike receive_part(), an invalid part
+        is counted and skipped. Stops at completion and returns the counts"""
+        stats = {"received": 0, "accepted": 0, "duplicates": 0, "rejected": 0}
+        fountain_decoder = self.fountain_decoder
+        duplicates = fountain_decoder.duplicate_parts_count
+        pending = 0
+        for part in () if self.result is not None else parts:
+            stats["received"] += 1
+            try:
+                key, part = self.decode_frame(part)
+            except ValueError:
+                stats["rejected"] += 1
+                continue
+
+            if part is None:
+                if key is None:
+                    # A single-part UR
+                    stats["accepted"] += 1
+                    break
+                self.dropped_parts_count += 1
+                stats["duplicates"] += 1
+                continue
+            if not self.accept_part(key, part, False):
+                stats["rejected"] += 1
+                continue
+            stats["accepted"] += 1
+
+            pending += 1
+            if pending == batch_size:
+                pending = 0
+                fountain_decoder.process_queue()
+            if fountain_decoder.is_complete():
+                self.finish()
+                break
+
+        if self.result is None and pending:
+            fountain_decoder.process_queue()
+            if fountain_decoder.is_complete():
+                self.finish()
+
+        # Parts dropped by the fountain decoder for an already seen seq_num
+        duplicates = fountain_decoder.duplicate_parts_count - duplicates
+        stats["accepted"] -= duplicates
+        stats["duplicates"] += duplicates
+        stats["complete"] = self.result is not None
+        return stats
+
+    def decode_frame(self, part):
+        """Parse and decode a frame for receive_parts(): its key and fountain
+        part, (key, None) for a repeated frame, or (None, None) once a
+        single-part UR is received. Raises ValueError for an invalid frame"""
+        _type, payload, is_multi = URDecoder.parse(part)
+        if not self.validate_part(_type):
+            raise ValueError("Unexpected UR type")
+        if not is_multi:
+            cbor = BytewordsDecoder.decode(payload)
+            cbor = self.fountain_decoder.store_message(cbor)
+            self.result = UR(_type.decode(), cbor)
+            return None, None
+
+        seq, fragment = payload
+        key = URDecoder.frame_key(seq, fragment)
+        if key in self.received_seqs:
+            return key, None
+        seq_num, seq_len = URDecoder.parse_sequence_component(seq)
+        part = FountainEncoderPart.from_cbor(BytewordsDecoder.decode(fragment))
+        if seq_num != part.seq_num or seq_len != part.seq_len:
+            raise ValueError("Sequence component doesn't match the part")
+        return key, part
+
+    def accept_part(self, key, part, process=True):
+        """Pass a decoded part to the fountain decoder and remember its frame.
+        The frame is recorded first, the part may be evicted right away"""
+        self.received_seqs.add(key)
+        if self.fountain_decoder.track_seq_nums:
+            self.seq_num_keys[part.seq_num] = key
+        if self.fountain_decoder.receive_part(part, process):
+            return True
+        self.received_seqs.discard(key)
+        self.seq_num_keys.pop(part.seq_num, None)
+        return False
+
+    def forget_part(self, seq_num):
+        key = self.seq_num_keys.pop(seq_num, None)
+        if key is not None:
+            self.received_seqs.discard(key)
+
+    def finish(self):
+        self.received_seqs.clear()
+        self.seq_num_keys.clear()
         if self.fountain_decoder.is_success():
-            self.result = UR(_type.decode(), self.fountain_decoder.result)
+            self.result = UR(self.expected_type.decode(), self.fountain_decoder.result)
         else:
             self.result = self.fountain_decoder.result
 
-        return True
-
     def expected_part_count(self):
         return self.fountain_decoder.expected_part_count()
 
@@ -117,5 +268,14 @@ class URDecoder(BasicDecoder):
     def processed_parts_count(self):
         return self.fountain_decoder.processed_parts_count
 
+    # Repeated frames, whether dropped here or by the fountain decoder
+    def duplicate_parts_count(self):
+        return self.dropped_parts_count + self.fountain_decoder.duplicate_parts_count
+
+    def buffered_bytes(self):
+        if isinstance(self.result, UR) and isinstance(self.result.cbor, bytearray):
+            return len(self.result.cbor)
+        return self.fountain_decoder.buffered_bytes()
+
     def estimated_percent_complete(self):
         return self.fountain_decoder.estimated_percent_complete()
@@ -5,16 +5,60 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
-from .fountain_encoder import FountainEncoder
+from .fountain_encoder import FountainEncoder, StreamFountainEncoder
+from .cbor_lite import CBOREncoder, Tag_Major_byteString
 from .bytewords.bytewords_encode import BytewordsEncoder
 
 
 class UREncoder:
-    # Start encoding a (possibly) multi-part UR
-    def __init__(self, ur, max_fragment_len, first_seq_num=0, min_fragment_len=10):
+    # Start encoding a (possibly) multi-part UR. `ur.cbor` may also be a
+    # seekable binary file or an mmap, which are read as parts need them
+    def __init__(
+        self,
+        ur,
+        max_fragment_len,
+        first_seq_num=0,
+        min_fragment_len=10,
+        schedule_window=0,
+        schedule_size=256,
+        stats=None,
+        checksum=None,
+    ):
         self.ur = ur
-        self.fountain_encoder = FountainEncoder(
-            ur.cbor, max_fragment_len, first_seq_num, min_fragment_len
+        self.stats = stats
+        if isinstance(ur.cbor, bytearray):
+            encoder_cls = FountainEncoder
+        else:
+            encoder_cls = StreamFountainEncoder
+        self.fountain_encoder = encoder_cls(
+            ur.cbor,
+            max_fragment_len,
+            first_seq_num,
+            min_fragment_len,
+            schedule_window,
+            schedule_size,
+            stats,
+            checksum,
+        )
+        self.single_part = self.fountain_encoder.is_single_part()
+        self.part_template = None
+        if not self.single_part:
+            self.part_template = self.make_part_template()
+
+    def make_part_template(self):
+        """The text around the seq_num of a multi-part UR and the CBOR fields
+        after it: every part shares them, only the seq_num and data change"""
+        fountain_encoder = self.fountain_encoder
+        encoder = CBOREncoder()
+        encoder.encodeInteger(fountain_encoder.seq_len())
+        encoder.encodeInteger(fountain_encoder.message_len)
+        encoder.encodeInteger(fountain_encoder.checksum)
+        # Header of the data byte string, every fragment has the same length
+        encoder.encodeTagAndValue(Tag_Major_byteString, fountain_encoder.fragment_len)
+        return (
+            "UR:" + self.ur.type + "/",
+            "-" + str(fountain_encoder.seq_len()) + "/",
+            bytes(encoder.get_bytes()),
         )
 
     # Encode a single-part UR
@@ -26,14 +70,50 @@ class UREncoder:
     # `True` if this UR can be contained in a single part. If `True`, repeated
     # calls to `next_part()` will all return the same single-part UR.
     def is_single_part(self):
-        return self.fountain_encoder.is_single_part()
+        return self.single_part
 
     def next_part(self):
         part = self.fountain_encoder.next_part()
-        if self.is_single_part():
-            return UREncoder.encode(self.ur)
-        return UREncoder.encode_part(self.ur.type, part)
+        if self.single_part:
+            # The only fragment is the whole message (plus any padding), so
+            # there is no need to read it again from ur.cbor
+            body = BytewordsEncoder.encode(memoryview(part.data)[: part.message_len])
+            return UREncoder.encode_ur(self.ur.type, body)
+
+        # Same as encode_part(), from the shared template
+        stats = self.stats
+        if stats is not None:
+            t = stats.start()
+        prefix, seq_len, tail = self.part_template
+        encoder = CBOREncoder()
+        encoder.encodeArraySize(5)
+        encoder.encodeUnsigned(part.seq_num)
+        cbor = encoder.get_bytes()
+        cbor += tail
+        cbor += part.data
+        if stats is not None:
+            t = stats.stop("encode_cbor", t)
+        body = BytewordsEncoder.encode(cbor)
+        if stats is not None:
+            stats.stop("encode_bytewords", t)
+        return prefix + str(part.seq_num) + seq_len + body
+
+    def next_parts(self, count):
+        """The next `count` parts, as a list"""
+        next_part = self.next_part
+        return [next_part() for _ in range(count)]
+
+    def iter_parts(self, count=None):
+        """Generate the next `count` parts, or parts without end if None"""
+        next_part = self.next_part
+        if count is None:
+            while True:
+                yield next_part()
+        for _ in range(count):
+            yield next_part()
 
+    # Encode one fountain part of a multi-part UR. Public API: next_part()
+    # renders the same string from the part template instead
     @staticmethod
     def encode_part(_type, part):
         seq = "{}-{}".format(part.seq_num, part.seq_len)
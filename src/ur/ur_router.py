@@ -0,0 +1,138 @@
+#
+# ur_router.py
+#
+# Copyright © 2020 Foundation Devices, Inc.
+# Licensed under the "BSD-2-Clause Plus Patent License"
+#
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from .cbor_lite import CBORDecoder
+from .bytewords.bytewords_decode import BytewordsDecoder
+from .ur_decoder import URDecoder
+
+# Longest CBOR header of a fountain part: the array and 4 uint32 fields
+PART_HEADER_LEN = 1 + 4 * 5
+
+
+class URRouter:
+    """Sends the frames of interleaved transfers to one URDecoder each,
+    keyed by (type, checksum, seq_len), so scanning another QR code midway
+    doesn't lose the progress of the first one.
+
+    The least recently used sessions are dropped when there are more than
+    `max_sessions`, when they are idle for longer than `ttl` seconds of
+    `clock` (monotonic, where there is one) or while all of them together
+    buffer more than `max_bytes`. Completed sessions stay until then, so that
+    their repeated frames are still ignored."""
+
+    def __init__(
+        self,
+        max_sessions=4,
+        ttl=None,
+        max_bytes=None,
+        decoder_factory=URDecoder,
+        clock=monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.decoder_factory = decoder_factory
+        self.clock = clock
+        self.sessions = {}  # key -> [decoder, last use]
+        self.lru = []  # keys, least recently used first
+        self.evicted_sessions_count = 0
+
+    @staticmethod
+    def session_key(_type, seq, fragment):
+        """The key of a multi-part frame, from its CBOR header only: the
+        session decodes and checks the whole part once. None if invalid"""
+        try:
+            seq_num, seq_len = URDecoder.parse_sequence_component(seq)
+            decoder = CBORDecoder(
+                BytewordsDecoder.decode_prefix(fragment, PART_HEADER_LEN)
+            )
+            if decoder.decodeArraySize()[0] != 5:
+                return None
+            fields = [decoder.decodeUnsigned()[0] for _ in range(4)]
+        except (ValueError, IndexError):
+            return None
+        if fields[0] != seq_num or fields[1] != seq_len:
+            return None
+        return _type, fields[3], seq_len
+
+    def receive_part(self, part):
+        """Receive a frame and return the decoder of its session, or None if
+        it can't be routed"""
+        try:
+            _type, payload, is_multi = URDecoder.parse(part)
+        except ValueError:
+            return None
+        if not is_multi:
+            decoder = self.decoder_factory()
+            try:
+                decoder.receive_part(part)
+            except ValueError:
+                return None
+            return decoder
+
+        key = self.session_key(_type, *payload)
+        if key is None:
+            return None
+
+        # The header doesn't cover the whole frame: a session is only made
+        # once its first frame decodes
+        session = self.sessions.get(key)
+        decoder = self.decoder_factory() if session is None else session[0]
+        try:
+            accepted = decoder.receive_part(part)
+        except ValueError:
+            return None
+
+        now = self.clock()
+        if session is None:
+            if not accepted:
+                return None
+            self.sessions[key] = [decoder, now]
+            self.lru.append(key)
+        else:
+            session[1] = now
+            if self.lru[-1] != key:
+                self.lru.remove(key)
+                self.lru.append(key)
+
+        self.evict(now)
+        return decoder
+
+    def evict(self, now=None):
+        lru = self.lru
+        if self.ttl is not None:
+            if now is None:
+                now = self.clock()
+            while lru and now - self.sessions[lru[0]][1] > self.ttl:
+                self.evict_key(lru[0])
+        while len(lru) > self.max_sessions:
+            self.evict_key(lru[0])
+        if self.max_bytes is not None:
+            # The most recently used session is always kept
+            while len(lru) > 1 and self.buffered_bytes() > self.max_bytes:
+                self.evict_key(lru[0])
+
+    def evict_key(self, key):
+        del self.sessions[key]
+        self.lru.remove(key)
+        self.evicted_sessions_count += 1
+
+    def remove(self, decoder):
+        """Drop the session of a decoder, e.g. once its result is used"""
+        for key, session in self.sessions.items():
+            if session[0] is decoder:
+                del self.sessions[key]
+                self.lru.remove(key)
+                return
+
+    def buffered_bytes(self):
+        return sum(session[0].buffered_bytes() for session in self.sessions.values())
@@ -35,10 +35,54 @@ def join_bytes(chunks):
     return out
 
 
-def xor_into(target, source):
+def _xor_bytes(target, source):
     for i, b in enumerate(source):
         target[i] ^= b
 
 
+def _xor_words(target, source):
+    # XOR the whole buffer as a single big integer: the work happens in C on
+    # machine words instead of one Python iteration per byte
+    n = len(source)
+    if not n:
+        return
+    if n > len(target):
+        # Like _xor_bytes, instead of growing a bytearray target
+        raise IndexError("XOR source is longer than the target")
+    acc = int.from_bytes(target[:n], "little") ^ int.from_bytes(source, "little")
+    target[:n] = acc.to_bytes(n, "little")
+
+
+def _select_xor():
+    """Pick the fastest XOR backend supported by this interpreter.
+    Ports built without arbitrary precision ints (some MicroPython
+    boards) can't hold a whole fragment in an int, so they fall back
+    to the byte loop"""
+    try:
+        t = bytearray(b"\x0f" * 16)
+        _xor_words(t, b"\xff" * 12)
+        if t == bytearray(b"\xf0" * 12 + b"\x0f" * 4):
+            return _xor_words
+    except:
+        pass
+    return _xor_bytes
+
+
+_xor_impl = None
+
+
+def xor_into(target, source):
+    global _xor_impl  # pylint: disable=global-statement
+    if _xor_impl is None:
+        _xor_impl = _select_xor()
+    _xor_impl(target, source)
+
+
+# Position of the single set bit in `bit` (without int.bit_length, which
+# MicroPython lacks)
+def bit_index(bit):
+    return len(bin(bit)) - 3
+
+
 def take_first(s, count):
     return s[:count]
@@ -12,7 +12,7 @@ except:
 
 from test_utils import make_message, make_message_ur, next_data
 
-# from ur.bytewords import STYLE_STANDARD, STYLE_URI, STYLE_MINIMAL
+from ur.bytewords import STYLE_STANDARD, STYLE_URI, STYLE_MINIMAL
 from ur.bytewords.bytewords_decode import BytewordsDecoder
 from ur.bytewords.bytewords_encode import BytewordsEncoder
 from ur.utils import xor_into
@@ -65,25 +65,46 @@ class TestUR(BaseClass):
         assert check_crc32("Hello, world!", "ebe6c6e6")
         assert check_crc32("Wolf", "598c84dc")
 
+    def test_crc32_streaming(self):
+        from ur.crc32 import CRC32
+
+        message = make_message(1000)
+        crc = CRC32()
+        assert(crc.value() == 0)
+        view = memoryview(message)
+        for i in range(0, len(message), 333):
+            crc.update(view[i : i + 333])
+        assert(crc.value() == crc32(message))
+        assert(crc.digest() == crc32(message).to_bytes(4, "big"))
+
     def test_bytewords_1(self):
         input = bytes([0, 1, 2, 128, 255])
-        # assert(BytewordsEncoder.encode(STYLE_STANDARD, input) == "able acid also lava zoom jade need echo taxi")
-        # assert(BytewordsEncoder.encode(STYLE_URI, input) == "able-acid-also-lava-zoom-jade-need-echo-taxi")
+        assert(BytewordsEncoder.encode(input, STYLE_STANDARD) == "able acid also lava zoom jade need echo taxi")
+        assert(BytewordsEncoder.encode(input, STYLE_URI) == "able-acid-also-lava-zoom-jade-need-echo-taxi")
         assert(BytewordsEncoder.encode(input) == "AEADAOLAZMJENDEOTI")
+        assert(BytewordsEncoder.encode(input, STYLE_MINIMAL) == "AEADAOLAZMJENDEOTI")
 
-        # assert(BytewordsDecoder.decode(STYLE_STANDARD, "ABLE acid also lava zoom jade need echo taxi") == input)
-        # assert(BytewordsDecoder.decode(STYLE_URI, "able-ACID-also-lava-zoom-jade-need-echo-taxi") == input)
+        assert(BytewordsDecoder.decode("ABLE acid also lava zoom jade need echo taxi", STYLE_STANDARD) == input)
+        assert(BytewordsDecoder.decode("able-ACID-also-lava-zoom-jade-need-echo-taxi", STYLE_URI) == input)
         assert(BytewordsDecoder.decode("AEadaolazmjendeoTI") == input)
 
         # bad checksum
-        # self.assertRaises(ValueError, lambda: BytewordsDecoder.decode(STYLE_STANDARD, "able acid also lava zoom jade need echo wolf"))
-        # self.assertRaises(ValueError, lambda: BytewordsDecoder.decode(STYLE_URI, "able-acid-also-lava-zoom-jade-need-echo-wolf"))
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("able acid also lava zoom jade need echo wolf", STYLE_STANDARD))
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("able-acid-also-lava-zoom-jade-need-echo-wolf", STYLE_URI))
 
         self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("AEADAOLAZMJENDEOWF"))
 
+        # wrong separator / unknown words
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("able-acid-also-lava-zoom-jade-need-echo-taxi", STYLE_STANDARD))
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("able acid also lava zoom jade need echo taxy", STYLE_STANDARD))
+
         # too short
-        # self.assertRaises(ValueError, lambda: BytewordsDecoder.decode(STYLE_STANDARD, "wolf"))
-        # self.assertRaises(ValueError, lambda: BytewordsDecoder.decode(STYLE_STANDARD, ""))
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("wolf", STYLE_STANDARD))
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("", STYLE_STANDARD))
+
+        # unknown style
+        self.assertRaises(ValueError, lambda: BytewordsEncoder.encode(input, 4))
+        self.assertRaises(ValueError, lambda: BytewordsDecoder.decode("AEADAOLAZMJENDEOTI", 4))
 
     def test_bytewords_2(self):
         input = bytes([
@@ -120,12 +141,40 @@ class TestUR(BaseClass):
             "fhecwzonnbmhcybtgwwelpflgmfezeonledtgocs" + \
             "fzhycypf"
 
-        # assert(BytewordsEncoder.encode(STYLE_STANDARD, input) == encoded)
+        assert(BytewordsEncoder.encode(input, STYLE_STANDARD) == encoded)
         assert(BytewordsEncoder.encode(input) == encoded_minimal.upper())
-        # assert(BytewordsDecoder.decode(STYLE_STANDARD, encoded) == input)
+        assert(BytewordsDecoder.decode(encoded, STYLE_STANDARD) == input)
         assert(BytewordsDecoder.decode(encoded_minimal) == input)
 
 
+    def test_bytewords_minimal_all_bytes(self):
+        from ur.bytewords import BYTEWORDS
+
+        input = bytes(range(256))
+        expected = "".join(
+            chr(BYTEWORDS[4 * i]) + chr(BYTEWORDS[4 * i + 3]) for i in range(256)
+        )
+        assert(BytewordsEncoder._encode_minimal(input) == expected)
+        assert(BytewordsEncoder._encode_minimal(b"") == "")
+        assert(BytewordsDecoder.decode(BytewordsEncoder.encode(input)) == input)
+
+    def test_bytewords_minimal_decode_paths(self):
+        input = bytes(range(256)) * 4
+        encoded = BytewordsEncoder.encode(input)
+        garbage = ["AE" * 10 + "A", "AE" * 10 + "A!", "AE" * 10 + "ZZ", "1234567890"]
+
+        pair_values = BytewordsDecoder._PAIR_VALUES
+        try:
+            # bulk path, then the word by word fallback used by MicroPython
+            for values in (pair_values, False):
+                BytewordsDecoder._PAIR_VALUES = values
+                assert(BytewordsDecoder.decode(encoded) == input)
+                assert(BytewordsDecoder.decode(encoded.lower()) == input)
+                for text in garbage:
+                    self.assertRaises(ValueError, lambda: BytewordsDecoder.decode(text))
+        finally:
+            BytewordsDecoder._PAIR_VALUES = pair_values
+
     def test_rng_1(self):
         rng = Xoshiro256.from_bytes(b"Wolf")
         numbers = []
@@ -171,6 +220,52 @@ class TestUR(BaseClass):
         expected_samples = [2, 3, 0, 0, 1, 0, 2, 0, 0, 3, 2, 1, 3, 1, 0, 2, 1, 0, 1, 0, 3, 0, 1, 1, 2, 1, 1, 3, 1, 0, 1, 0, 0, 0, 1, 0, 0, 3, 0, 1, 0, 3, 0, 1, 1, 3, 0, 0, 2, 0, 0, 1, 0, 3, 0, 0, 0, 0, 0, 3, 0, 2, 1, 0, 1, 3, 0, 2, 0, 1, 0, 0, 1, 0, 1, 1, 2, 0, 2, 0, 0, 0, 0, 2, 0, 1, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 2, 0, 1, 1, 0, 2, 0, 0, 1, 1, 0, 2, 0, 1, 1, 3, 0, 2, 2, 1, 2, 1, 1, 2, 1, 0, 0, 0, 3, 3, 0, 1, 1, 1, 0, 0, 0, 1, 0, 2, 0, 3, 0, 2, 2, 1, 0, 2, 1, 1, 0, 2, 2, 3, 0, 2, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 0, 2, 0, 0, 0, 3, 0, 0, 0, 0, 1, 0, 0, 2, 1, 1, 1, 1, 1, 1, 1, 0, 1, 3, 2, 0, 0, 0, 0, 0, 1, 2, 0, 3, 0, 2, 0, 2, 2, 0, 0, 2, 0, 3, 0, 0, 2, 2, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 0, 2, 3, 0, 2, 0, 2, 1, 2, 0, 0, 1, 0, 3, 0, 2, 0, 0, 0, 0, 3, 2, 0, 3, 0, 0, 0, 1, 2, 0, 3, 0, 3, 3, 3, 0, 0, 1, 1, 2, 0, 0, 1, 0, 2, 2, 0, 0, 1, 0, 2, 1, 0, 3, 1, 3, 0, 0, 2, 0, 1, 1, 0, 2, 0, 0, 1, 0, 1, 0, 1, 0, 0, 3, 0, 2, 0, 3, 2, 1, 2, 0, 0, 0, 0, 0, 3, 0, 0, 2, 0, 2, 1, 0, 2, 0, 0, 3, 3, 0, 2, 3, 1, 1, 0, 2, 2, 1, 1, 1, 0, 1, 2, 2, 3, 0, 2, 0, 2, 2, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0, 0, 1, 2, 0, 1, 0, 0, 2, 2, 3, 0, 2, 0, 2, 1, 1, 0, 1, 3, 0, 0, 3, 1, 0, 0, 0, 3, 1, 1, 3, 0, 2, 3, 0, 3, 2, 0, 3, 1, 0, 0, 3, 0, 1, 0, 0, 1, 3, 0, 2, 0, 1, 2, 0, 0, 0, 3, 3, 2, 0, 2, 0, 1, 1, 0, 0, 1, 0, 0, 0, 3, 2, 0, 3, 0, 0, 0, 3, 0, 0, 2, 1, 0, 0, 1, 1, 1, 2, 0, 0, 0, 1, 0, 3, 0, 0, 1, 1, 0, 0, 1, 2, 3, 0, 1, 1, 0, 0, 0, 0, 3, 2, 1, 0, 0, 0, 1, 1, 0, 2, 3, 0, 0, 3, 1, 0, 2, 0, 1, 0, 0, 1, 1, 2, 0, 1, 0, 0, 0, 0, 0, 3, 0, 2]
         assert(samples == expected_samples)
 
+    def test_degree_sampler_cache_lru(self):
+        from ur.fountain_utils import _DegreeSamplerCache
+
+        cache = _DegreeSamplerCache(max_bytes=3 * 100 * 5)
+        s100 = cache.get(100)
+        s200 = cache.get(200)
+        assert(cache.get(100) is s100)
+        cache.get(150)
+        # 200 is the least recently used and the budget only fits 100 + 150
+        assert(sorted(cache._samplers) == [100, 150])
+        assert(cache.nbytes == 250 * 5)
+        # an evicted sampler remains usable by whoever holds it
+        assert(s200.next(lambda: 0.5) < 200)
+
+        cache.set_max_bytes(0)
+        # the most recently used one is always kept
+        assert(list(cache._samplers) == [150])
+        cache.clear()
+        assert(cache.nbytes == 0 and not cache._samplers)
+
+    def test_degree_sampler_cache_threads(self):
+        try:
+            import threading
+        except ImportError:
+            return
+        from ur.fountain_utils import _DegreeSamplerCache
+
+        cache = _DegreeSamplerCache(max_bytes=2000)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(200):
+                    seq_len = 2 + (i + offset) % 7
+                    assert(len(cache.get(seq_len).probs) == seq_len)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert(not errors)
+        assert(len(cache._lru) == len(cache._samplers))
+
     def test_partition_and_join(self):
         message = make_message(1024)
         fragment_len = FountainEncoder.find_nominal_fragment_length(len(message), 10, 100)
@@ -256,6 +351,20 @@ class TestUR(BaseClass):
         ]
         assert(fragment_indexes == expected_fragment_indexes)
 
+    def test_choose_fragments_large(self):
+        from ur.fountain_utils import choose_degree
+
+        # Reference: pop the chosen position from the list of remaining indexes
+        def reference(seq_num, seq_len, checksum):
+            rng = Xoshiro256.from_bytes(seq_num.to_bytes(4, "big") + checksum.to_bytes(4, "big"))
+            degree = choose_degree(seq_len, rng)
+            remaining = list(range(seq_len))
+            return frozenset(remaining.pop(rng.next_int(0, len(remaining) - 1)) for _ in range(degree))
+
+        for seq_len in (300, 3000):
+            for seq_num in range(seq_len + 1, seq_len + 200):
+                assert(choose_fragments(seq_num, seq_len, 0xDEADBEEF) == reference(seq_num, seq_len, 0xDEADBEEF))
+
     def test_xor(self):
         rng = Xoshiro256.from_bytes(b"Wolf")
         data1 = next_data(rng, 10)
@@ -273,6 +382,26 @@ class TestUR(BaseClass):
         xor_into(t, s)
         assert(t == b'\x01\x02\x03\x00\x00')
 
+    def test_xor_backends(self):
+        from ur.utils import _xor_bytes, _xor_words
+
+        rng = Xoshiro256.from_bytes(b"Wolf")
+        source = next_data(rng, 1000)
+        for n in (0, 1, 7, 8, 999, 1000):
+            a = next_data(rng, 1000)
+            b = a[:]
+            _xor_bytes(a, source[:n])
+            _xor_words(b, source[:n])
+            assert(a == b)
+        # works on slices of a larger buffer without copying it
+        t = bytearray(8)
+        _xor_words(t, memoryview(b'\x01\x02\x03\x04\x05')[1:4])
+        assert(t == b'\x02\x03\x04\x00\x00\x00\x00\x00')
+        # and neither grows a shorter target
+        for xor in (_xor_bytes, _xor_words, xor_into):
+            t = bytearray(3)
+            self.assertRaises(IndexError, lambda: xor(t, b'\x01\x02\x03\x04\x05'))
+
 
     def test_fountain_encoder(self):
         message = make_message(256)
@@ -347,6 +476,63 @@ class TestUR(BaseClass):
         ]
         assert(parts == expected_parts)
 
+    def test_fountain_encoder_schedule(self):
+        message = make_message(1024)
+        encoder = FountainEncoder(message, 100)
+        scheduled = FountainEncoder(message, 100, schedule_window=8, schedule_size=20)
+        for i in range(60):
+            a = encoder.next_part()
+            b = scheduled.next_part()
+            assert(a.seq_num == b.seq_num and a.data == b.data)
+
+        schedule = scheduled.schedule
+        assert(len(schedule._cache) <= 20)
+
+        # looping back over the same seq_nums hits the cache
+        scheduled.seq_num = 50
+        cached = schedule._cache[51]
+        assert(scheduled.next_part().seq_num == 51)
+        assert(schedule.get(51) is cached)
+
+    def test_stream_fountain_encoder(self):
+        import io
+        from ur.fountain_encoder import StreamFountainEncoder
+
+        message = make_message(10000)
+        expected_encoder = FountainEncoder(message, 300, 5)
+        expected = [expected_encoder.next_part().cbor() for _ in range(60)]
+
+        sources = [io.BytesIO(bytes(message)), bytes(message)]
+        try:
+            import mmap
+            import tempfile
+            f = tempfile.TemporaryFile()
+            f.write(message)
+            f.flush()
+            sources.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ImportError:
+            f = None
+
+        for source in sources:
+            encoder = StreamFountainEncoder(source, 300, 5)
+            assert(encoder.checksum == expected_encoder.checksum)
+            assert([encoder.next_part().cbor() for _ in range(60)] == expected)
+
+        if f is not None:
+            encoder = None  # drops its view of the mmap
+            sources[-1].close()
+            f.close()
+
+        # The UR encoder reads a file backed UR the same way
+        from ur.ur import UR
+        for length in (50, 5000):
+            ur = make_message_ur(length)
+            file_ur = UR(ur.type, io.BytesIO(bytes(ur.cbor)))
+            encoder = UREncoder(ur, 1000)
+            file_encoder = UREncoder(file_ur, 1000)
+            for i in range(10):
+                assert(file_encoder.next_part() == encoder.next_part())
+
     def test_fountain_encoder_is_complete(self):
         message = make_message(256)
         encoder = FountainEncoder(message, 30)
@@ -375,8 +561,9 @@ class TestUR(BaseClass):
         d.process_mixed_part(p)
 
         # It should be stored as a mixed part
-        assert p.indexes in d.mixed_parts
-        assert d.mixed_parts[p.indexes] is p
+        assert p.mask in d.mixed_parts
+        assert d.mixed_parts[p.mask] is p
+        assert d.fragment_parts == {0: {p}, 1: {p}}
 
 
     def test_process_mixed_part_reduces_to_simple(self):
@@ -387,7 +574,7 @@ class TestUR(BaseClass):
             indexes={0},
             data=bytearray(b'\x01\x02')
         )
-        d.simple_parts[simple.indexes] = simple
+        d.simple_parts[simple.index()] = simple
 
         # Mixed part including that index
         mixed = FountainDecoder.Part(
@@ -427,6 +614,240 @@ class TestUR(BaseClass):
             print(decoder.result)
             assert(False)
 
+    def test_fountain_decoder_duplicates(self):
+        message = make_message(1024)
+        encoder = FountainEncoder(message, 100, 20)
+        decoder = FountainDecoder()
+        received = 0
+        while True:
+            part = encoder.next_part()
+            assert(decoder.receive_part(part))
+            received += 1
+            if decoder.is_complete():
+                break
+            for i in range(4):
+                assert(decoder.receive_part(part))
+        assert(decoder.result == message)
+        assert(decoder.processed_parts_count == received)
+        assert(decoder.duplicate_parts_count == 4 * (received - 1))
+
+        # A mixed part reduced to one already held is dropped as well
+        d = FountainDecoder()
+        d.expected_part_indexes = {0, 1, 2}
+        p = FountainDecoder.Part({0, 1}, bytearray(b'\x01'))
+        d.process_mixed_part(p)
+        d.process_mixed_part(FountainDecoder.Part({0, 1}, bytearray(b'\x01')))
+        assert(d.mixed_parts == {p.mask: p})
+
+    def test_fountain_decoder_buffer_ownership(self):
+        message = make_message(3000)
+        encoder = FountainEncoder(message, 100, 40)
+        for use_elimination in (False, True):
+            decoder = FountainDecoder(use_elimination)
+            received = []
+            while not decoder.is_complete():
+                # parts arrive as views into their CBOR, like from URDecoder
+                part = Part.from_cbor(encoder.next_part().cbor())
+                assert(isinstance(part.data, memoryview))
+                received.append((part, bytes(part.data)))
+                decoder.receive_part(part)
+                assert(len(decoder.free_buffers) <= FountainDecoder.MAX_FREE_BUFFERS)
+            assert(decoder.result == message)
+            # the decoder never wrote into the caller's buffers
+            for part, data in received:
+                assert(part.data == data)
+
+        # redundant parts give their buffer back for the next frame
+        decoder = FountainDecoder()
+        decoder.validate_part(Part(1, 3, 6, 0, bytearray(2)))
+        first = bytearray(b'\x01\x02')
+        decoder.process_simple_part(FountainDecoder.Part({0}, first))
+        # a resolved fragment is copied into the message, its buffer is free
+        assert(decoder.free_buffers == [first])
+        assert(decoder.simple_parts[0].data == b'\x01\x02')
+        redundant = bytearray(2)
+        decoder.process_simple_part(FountainDecoder.Part({0}, redundant))
+        assert(decoder.free_buffers == [first, redundant])
+        assert(decoder.acquire_buffer(b'\x03\x04') is redundant)
+        assert(redundant == b'\x03\x04')
+
+    def test_fountain_decoder_assembly(self):
+        from ur.fountain_decoder import InvalidChecksum
+
+        message = make_message(1005)
+        encoder = FountainEncoder(message, 100)
+        parts = [encoder.next_part() for _ in range(encoder.seq_len())]
+
+        # fragments arrive out of order, the CRC follows the contiguous prefix
+        decoder = FountainDecoder()
+        for part in reversed(parts[1:]):
+            decoder.receive_part(part)
+        assert(decoder.crc_len == 0)
+        decoder.receive_part(parts[0])
+        assert(decoder.is_success())
+        assert(decoder.result == message)
+
+        # a message that doesn't match its checksum
+        decoder = FountainDecoder()
+        for part in parts:
+            part.checksum ^= 1
+            decoder.receive_part(part)
+        assert(decoder.is_complete())
+        assert(isinstance(decoder.result, InvalidChecksum))
+
+    def test_fountain_decoder_output(self):
+        import io
+        import mmap
+        import tempfile
+
+        message = make_message(3005)
+        for use_elimination in (False, True):
+            # resolved fragments are written to a file and read back from it
+            out = io.BytesIO()
+            encoder = FountainEncoder(message, 100, 90)
+            decoder = FountainDecoder(use_elimination, out)
+            while not decoder.is_complete():
+                decoder.receive_part(encoder.next_part())
+            assert(decoder.is_success())
+            assert(decoder.result is out)
+            assert(out.getvalue() == message)
+            assert(not decoder.simple_parts and not decoder.rows)
+
+            # or straight into a writable mmap
+            with tempfile.TemporaryFile() as f:
+                f.truncate(len(message))
+                out = mmap.mmap(f.fileno(), len(message))
+                encoder = FountainEncoder(message, 100, 90)
+                decoder = FountainDecoder(use_elimination, out)
+                while not decoder.is_complete():
+                    decoder.receive_part(encoder.next_part())
+                assert(decoder.is_success())
+                assert(out[:] == message)
+                decoder = None  # drops its views of the mmap
+                out.close()
+
+        self.assertRaises(ValueError, lambda: FountainDecoder(output=bytearray(10)).receive_part(
+            FountainEncoder(message, 100).next_part()))
+
+        # the mixed parts held in RAM are capped
+        encoder = FountainEncoder(message, 100, 100)
+        decoder = FountainDecoder(max_mixed_parts=4)
+        while not decoder.is_complete():
+            decoder.receive_part(encoder.next_part())
+            assert(len(decoder.mixed_parts) <= 4)
+        assert(decoder.result == message)
+        assert(decoder.evicted_parts_count > 0)
+
+        # through the UR layer
+        ur = make_message_ur(5000)
+        encoder = UREncoder(ur, 200)
+        out = io.BytesIO()
+        decoder = URDecoder(output=out, max_mixed_parts=8)
+        while not decoder.is_complete():
+            decoder.receive_part(encoder.next_part())
+        assert(decoder.is_success())
+        assert(out.getvalue() == ur.cbor)
+
+        # a single-part UR goes to the output too
+        ur = make_message_ur(50)
+        for receive in (URDecoder.receive_part, lambda d, part: d.receive_parts([part])):
+            out = io.BytesIO()
+            decoder = URDecoder(output=out)
+            receive(decoder, UREncoder.encode(ur))
+            assert(decoder.result.cbor is out and out.getvalue() == ur.cbor)
+        out = bytearray(60)
+        decoder = URDecoder(output=out)
+        decoder.receive_part(UREncoder.encode(ur))
+        assert(decoder.result.cbor is out and out[:len(ur.cbor)] == ur.cbor)
+        self.assertRaises(ValueError, lambda: URDecoder(output=bytearray(10)).receive_part(
+            UREncoder.encode(ur)))
+
+    def test_fountain_decoder_memory_budget(self):
+        from ur.stats import Stats
+
+        message = make_message(10000)
+        for use_elimination in (False, True):
+            for policy in (FountainDecoder.EVICT_HIGHEST_DEGREE, FountainDecoder.EVICT_OLDEST):
+                stats = Stats()
+                encoder = FountainEncoder(message, 100, 100)
+                decoder = FountainDecoder(use_elimination, stats=stats, max_mixed_bytes=1000,
+                                          eviction_policy=policy, compaction_threshold=2)
+                while not decoder.is_complete():
+                    decoder.receive_part(encoder.next_part())
+                    unresolved = len(decoder.rows) - len(decoder.received_part_indexes)
+                    assert(len(decoder.mixed_parts) + unresolved <= 10)
+                    assert(len(decoder.queued_parts) <= 12)
+                assert(decoder.result == message)
+                assert(decoder.evicted_parts_count > 0)
+                assert(stats.counters["evictions"] == decoder.evicted_parts_count)
+
+        # a display looping over a fixed set of frames: evicted parts are
+        # forgotten, so their frames are received again on the next loop
+        ur = make_message_ur(5000)
+        frames = UREncoder(ur, 100, 60).next_parts(102)
+        for use_elimination in (False, True):
+            for max_mixed_parts in (3, 0):
+                decoder = URDecoder(use_elimination, max_mixed_parts=max_mixed_parts)
+                loops = 0
+                while not decoder.is_complete():
+                    loops += 1
+                    assert(loops <= 5)
+                    if max_mixed_parts:
+                        for frame in frames:
+                            decoder.receive_part(frame)
+                    else:
+                        decoder.receive_parts(frames)
+                assert(decoder.result == ur)
+                assert(decoder.fountain_decoder.evicted_parts_count > 0)
+
+        # deferred parts are processed before they go over the budget
+        encoder = FountainEncoder(message, 100, 100)
+        decoder = FountainDecoder(max_mixed_parts=10)
+        for _ in range(50):
+            decoder.receive_part(encoder.next_part(), False)
+            assert(len(decoder.queued_parts) - decoder.queue_index <= 10)
+
+    def test_fountain_decoder_elimination(self):
+        parts_needed = {False: 0, True: 0}
+        for seed in range(10):
+            message = make_message(2000, b"Wolf-" + str(seed).encode())
+            for use_elimination in (False, True):
+                encoder = FountainEncoder(message, 100, 100 + seed)
+                decoder = FountainDecoder(use_elimination)
+                while not decoder.is_complete():
+                    decoder.receive_part(encoder.next_part())
+                    parts_needed[use_elimination] += 1
+                assert(decoder.result == message)
+        assert(parts_needed[True] < parts_needed[False])
+
+        # Also through the UR layer, with every other part lost
+        ur = make_message_ur(5000)
+        encoder = UREncoder(ur, 200)
+        decoder = URDecoder(use_elimination=True)
+        while not decoder.is_complete():
+            encoder.next_part()
+            decoder.receive_part(encoder.next_part())
+        assert(decoder.is_success())
+        assert(decoder.result == ur)
+
+    def test_fountain_concurrent_sessions(self):
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            return
+
+        def session(i):
+            message = make_message(200 + 37 * (i % 13), b"Wolf-" + str(i).encode())
+            encoder = FountainEncoder(message, 20 + i % 9, i)
+            decoder = FountainDecoder()
+            while not decoder.is_complete():
+                decoder.receive_part(encoder.next_part())
+            return decoder.result == message
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(session, range(300)))
+        assert(all(results))
+
     def test_fountain_cbor(self):
         part = Part(12, 8, 100, 0x12345678, bytes([1, 5, 3, 3 ,5]))
         cbor = part.cbor()
@@ -520,6 +941,274 @@ class TestUR(BaseClass):
             print('{}'.format(decoder.result))
             assert(False)
 
+    def test_ur_encoder_batch(self):
+        # same parts as encode_part(), including 1 and 2 byte CBOR headers
+        for message_len, max_fragment_len in ((300, 20), (5000, 300)):
+            ur = make_message_ur(message_len)
+            encoder = UREncoder(ur, max_fragment_len, 20)
+            fountain_encoder = FountainEncoder(ur.cbor, max_fragment_len, 20)
+            parts = encoder.next_parts(10)
+            parts += list(encoder.iter_parts(5))
+            for part in parts:
+                expected = UREncoder.encode_part(ur.type, fountain_encoder.next_part())
+                assert(part == expected)
+            assert(len(parts) == 15)
+
+        parts = encoder.iter_parts()
+        decoder = URDecoder()
+        while not decoder.is_complete():
+            decoder.receive_part(next(parts))
+        assert(decoder.result == ur)
+
+        ur = make_message_ur(10)
+        encoder = UREncoder(ur, 100)
+        assert(encoder.next_parts(3) == [UREncoder.encode(ur)] * 3)
+
+    def test_parallel_encode_parts(self):
+        import io
+        import tempfile
+        from ur.parallel import encode_parts
+        from ur.ur import UR
+
+        ur = make_message_ur(5000)
+        expected = UREncoder(ur, 200, 30).next_parts(50)
+        assert(encode_parts(ur, 200, 50, 30, workers=2, chunk_size=7) == expected)
+
+        # a message file is mapped by the workers
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(ur.cbor)
+            f.flush()
+            parts = encode_parts(UR(ur.type, f), 200, 50, 30, workers=2)
+            assert(parts == expected)
+
+            # a known checksum is used as is, not computed again
+            encoder = UREncoder(UR(ur.type, f), 200, 30, checksum=1)
+            assert(encoder.fountain_encoder.checksum == 1)
+            checksum = crc32(ur.cbor)
+            encoder = UREncoder(UR(ur.type, f), 200, 30, checksum=checksum)
+            assert(encoder.next_parts(50) == expected)
+        encoder = UREncoder(ur, 200, 30, checksum=checksum)
+        assert(encoder.next_parts(50) == expected)
+
+        # file objects without a path are read into shared memory
+        parts = encode_parts(UR(ur.type, io.BytesIO(ur.cbor)), 200, 50, 30, workers=2)
+        assert(parts == expected)
+        with tempfile.TemporaryFile() as f:
+            f.write(ur.cbor)
+            assert(encode_parts(UR(ur.type, f), 200, 50, 30, workers=2) == expected)
+
+        ur = make_message_ur(10)
+        assert(encode_parts(ur, 100, 3) == [UREncoder.encode(ur)] * 3)
+
+    def test_ur_decoder_receive_parts(self):
+        ur = make_message_ur(5000)
+        encoder = UREncoder(ur, 200, 50)
+        parts = encoder.next_parts(60)
+        recording = []
+        for part in parts:
+            recording += [part, part]
+        recording.insert(3, "ur:bytes/1-2/lpadaobbcydmlfl")
+        # valid Bytewords and CRC, truncated CBOR header
+        recording.insert(7, "ur:bytes/1-2/" + BytewordsEncoder.encode(b"\x85\x01"))
+
+        decoder = URDecoder()
+        stats = decoder.receive_parts(recording)
+        assert(decoder.result == ur)
+        assert(stats["complete"])
+        assert(stats["received"] == len(recording))
+        assert(stats["rejected"] == 2)
+        assert(stats["duplicates"] == stats["received"] - 2 - stats["accepted"])
+        assert(decoder.duplicate_parts_count() == stats["duplicates"])
+
+        # an endless iterable is peeled every batch_size parts, and is left
+        # at the part that completed the message
+        parts = encoder.iter_parts()
+        decoder = URDecoder()
+        stats = decoder.receive_parts(parts, batch_size=5)
+        assert(decoder.result == ur)
+        assert(stats["received"] % 5 == 0)
+        assert(decoder.receive_parts(parts)["received"] == 0)
+
+        # same result as one part at a time
+        decoder = URDecoder()
+        for part in encoder.next_parts(20):
+            decoder.receive_part(part)
+        decoder.receive_parts(encoder.next_parts(100))
+        assert(decoder.result == ur)
+
+    def test_ur_async(self):
+        import asyncio
+        from ur.ur_async import AsyncURDecoder, AsyncUREncoder
+
+        ur = make_message_ur(5000)
+
+        async def frames(encoder):
+            async for part in encoder:
+                yield part
+                yield part  # camera sees each frame twice
+                await asyncio.sleep(0)
+
+        async def main():
+            decoder = AsyncURDecoder()
+            progress = []
+
+            async def watch():
+                while not decoder.is_complete():
+                    progress.append(await decoder.progress())
+
+            watcher = asyncio.ensure_future(watch())
+            async with AsyncUREncoder(UREncoder(ur, 200, 40), 2) as encoder:
+                result = await decoder.consume(frames(encoder))
+                assert(encoder.queue.qsize() <= 2)
+            assert(await decoder.wait_complete() is result)
+            await watcher
+            return result, progress
+
+        result, progress = asyncio.run(main())
+        assert(result == ur)
+        assert(progress and progress[-1] == 1)
+
+        # one part at a time
+        async def one_by_one():
+            decoder = AsyncURDecoder()
+            encoder = UREncoder(ur, 200)
+            while not decoder.is_complete():
+                await decoder.receive_part(encoder.next_part())
+            return decoder.decoder.result
+
+        assert(asyncio.run(one_by_one()) == ur)
+
+    def test_ur_router(self):
+        from ur.ur import UR
+        from ur.ur_router import URRouter
+
+        # two transfers of the same type, scanned in turns
+        ur_a = make_message_ur(3000, b"Wolf")
+        ur_b = make_message_ur(4000, b"Fox")
+        ur_c = UR("crypto-psbt", make_message(3000, b"Wolf"))
+        encoders = [UREncoder(ur, 150, 60) for ur in (ur_a, ur_b, ur_c)]
+        router = URRouter()
+        results = {}
+        while len(results) < 3:
+            for i, encoder in enumerate(encoders):
+                for _ in range(3):
+                    decoder = router.receive_part(encoder.next_part())
+                    if decoder.is_complete():
+                        results[i] = decoder.result
+        assert(results[0] == ur_a and results[1] == ur_b and results[2] == ur_c)
+        assert(len(router.sessions) == 3)
+        assert(router.evicted_sessions_count == 0)
+        assert(router.receive_part(UREncoder.encode(ur_a)).result == ur_a)
+        assert(router.receive_part("ur:bytes/1-2/lpadaobbcydmlfl") is None)
+        # a valid Bytewords checksum over a truncated part header
+        truncated = BytewordsEncoder.encode(b"\x85\x01")
+        assert(router.receive_part("ur:bytes/1-2/" + truncated) is None)
+        assert(router.receive_part("ur:bytes") is None)
+        assert(router.receive_part("ur:bytes/1-2/") is None)
+        router.remove(decoder)
+        assert(len(router.sessions) == 2)
+
+        # idle sessions time out
+        now = [0]
+        router = URRouter(ttl=10, clock=lambda: now[0])
+        a, b = (UREncoder(ur, 150) for ur in (ur_a, ur_b))
+        router.receive_part(a.next_part())
+        now[0] = 5
+        router.receive_part(b.next_part())
+        now[0] = 12
+        decoder = router.receive_part(b.next_part())
+        assert(list(router.sessions.values()) == [[decoder, 12]])
+
+        # and the least recently used ones go over budget
+        router = URRouter(max_sessions=2)
+        for ur in (ur_a, ur_b, ur_c):
+            router.receive_part(UREncoder(ur, 150).next_part())
+        assert(router.evicted_sessions_count == 1)
+        assert(router.lru[0][0] == b"BYTES" and router.lru[1][0] == b"CRYPTO-PSBT")
+        router.max_bytes = 5000
+        router.evict()
+        assert(len(router.sessions) == 1)
+
+        # a corrupted frame whose header still decodes opens no session
+        router = URRouter(max_sessions=1)
+        frame = UREncoder(ur_a, 150).next_part()
+        decoder = router.receive_part(frame)
+        prefix, body = frame.rsplit("/", 1)
+        part = Part.from_cbor(BytewordsDecoder.decode(body.lower()))
+        part.checksum = 0
+        body = BytewordsEncoder.encode(part.cbor())
+        body = body[:-2] + ("ae" if body[-2:] != "ae" else "ad")
+        assert(router.receive_part(prefix + "/" + body.upper()) is None)
+        assert(list(router.sessions.values())[0][0] is decoder)
+        assert(len(router.sessions) == 1 and router.evicted_sessions_count == 0)
+
+    def test_stats(self):
+        from ur.stats import Stats
+
+        ur = make_message_ur(5000)
+        timed = []
+        stats = Stats(lambda stage, us: timed.append(stage))
+        encoder = UREncoder(ur, 200, 30, stats=stats)
+        decoder = URDecoder(stats=stats)
+        while not decoder.is_complete():
+            part = encoder.next_part()
+            decoder.receive_part(part)
+            decoder.receive_part(part)
+        assert(decoder.result == ur)
+
+        report = stats.report()
+        for stage in ("choose_fragments", "mix", "encode_cbor", "encode_bytewords",
+                      "parse", "decode_bytewords", "decode_cbor", "fountain",
+                      "peel_simple", "peel_mixed"):
+            assert(report["calls"][stage] > 0)
+            assert(report["times_us"][stage] >= 0)
+        # the encoder and decoder stages are counted apart
+        calls = report["calls"]
+        assert(calls["decode_bytewords"] == calls["encode_bytewords"])
+        assert(calls["decode_cbor"] == calls["encode_cbor"])
+        # the second copy of the last part comes after completion
+        assert(report["counters"]["duplicates"] == report["calls"]["parse"] - 1)
+        assert(report["counters"]["reductions"] > 0)
+        assert(report["counters"]["xor_bytes"] > 0)
+        assert(report["peaks"]["queue_length"] >= 1)
+        assert(len(timed) == sum(report["calls"].values()))
+
+        stats.reset()
+        decoder = URDecoder(use_elimination=True, stats=stats)
+        while not decoder.is_complete():
+            decoder.receive_part(encoder.next_part())
+        assert(stats.calls["eliminate"] == stats.calls["fountain"])
+
+    def test_multipart_ur_repeated_frames(self):
+        ur = make_message_ur(5000)
+        encoder = UREncoder(ur, 200, 10)
+        decoder = URDecoder()
+        frames = 0
+        while True:
+            part = encoder.next_part()
+            assert(decoder.receive_part(part))
+            frames += 1
+            if decoder.is_complete():
+                break
+            # the scanner sees every QR code a few times
+            assert(decoder.receive_part(part))
+            assert(decoder.receive_part(part))
+        assert(decoder.is_success())
+        assert(decoder.result == ur)
+        assert(decoder.dropped_parts_count == 2 * (frames - 1))
+        assert(decoder.duplicate_parts_count() == 2 * (frames - 1))
+        assert(decoder.processed_parts_count() == frames)
+        assert(not decoder.received_seqs)
+
+        # a frame of another transfer with a seen seq label is still rejected
+        other = make_message_ur(5000, b"Fox")
+        decoder = URDecoder()
+        assert(decoder.receive_part(UREncoder(ur, 200, 1).next_part()))
+        foreign = UREncoder(other, 200, 1).next_part()
+        assert(foreign.split("/")[1] == "2-26")
+        assert(not decoder.receive_part(foreign))
+        assert(decoder.dropped_parts_count == 0)
+
     def test_cbor_encode_decode_single(self):
         from ur.cbor_lite import CBOREncoder, CBORDecoder
 
@@ -0,0 +1,42 @@
+#
+# whitelist.py
+#
+# Copyright © 2020 Foundation Devices, Inc.
+# Licensed under the "BSD-2-Clause Plus Patent License"
+#
+# Public API that nothing in src uses, for vulture:
+#
+#   poetry run vulture src whitelist.py
+#
+# Not meant to be run. Generate entries with `vulture src --make-whitelist`.
+
+# ur_async.py
+AsyncURDecoder
+_.consume
+_.progress
+_.wait_complete
+AsyncUREncoder
+
+# ur_router.py
+URRouter
+_.evicted_sessions_count
+
+# ur_encoder.py
+_.iter_parts
+_.encode_part
+
+# fountain_utils.py
+set_degree_cache_limit
+reset_degree_cache
+
+# fountain_decoder.py
+_.join_fragments
+_.evicted_parts_count
+
+# parallel.py
+encode_parts
+
+# stats.py
+Stats
+_.reset
+_.report